@@ -3,6 +3,7 @@ API роуты для обработки гайдов.
 Реализует функционал AI-обработки, видео-рендеринга и "магического редактирования".
 """
 
+import asyncio
 import logging
 from datetime import datetime
 from typing import List, Optional
@@ -26,8 +27,6 @@ from app.schemas import (
     JobResponse,
     ErrorResponse,
 )
-from app.services.ai_service import ai_service
-from app.services.video_processor import video_processor
 from app.services.storage import storage_service, StorageType
 
 
@@ -153,7 +152,9 @@ async def render_video_with_steps(
     - Zoom на области кликов
     - Наложение курсора
     """
-    from app.services.video_processor import StepSegment, ZoomRegion
+    # Импорт внутри функции: VideoProcessor при создании проверяет ffmpeg,
+    # а API не должен платить за это при старте.
+    from app.services.video_processor import StepSegment, ZoomRegion, video_processor
     
     # Получаем шаги
     query = select(GuideStep).where(GuideStep.guide_id == guide_id)
@@ -199,17 +200,20 @@ async def render_video_with_steps(
     
     output_path = f"/tmp/guides/{guide_id}/processed.mp4"
     
-    # Запускаем рендеринг
-    success = video_processor.generate_video_with_zoom(
+    # Запускаем рендеринг. FFmpeg работает минутами - в потоке, чтобы
+    # не блокировать event loop остальных запросов
+    success = await asyncio.to_thread(
+        video_processor.generate_video_with_zoom,
         input_video=guide.original_video_path,
         output_video=output_path,
         steps=segments,
     )
     
     if success:
-        # Загружаем в хранилище
+        # Загружаем в хранилище (копирование файла - тоже в потоке)
         try:
-            upload_result = storage_service.upload_local_file(
+            upload_result = await asyncio.to_thread(
+                storage_service.upload_local_file,
                 file_path=output_path,
                 bucket=StorageType.VIDEOS,
                 guide_id=guide_id,
@@ -290,7 +290,7 @@ async def test_tts_for_step(
 ):
     """
     ТЕСТ: Генерация TTS для одного шага.
-    Возвращает аудио файл.
+    Отдаёт MP3 потоком по мере синтеза.
     """
     from sqlalchemy import select
     from app.models import GuideStep
@@ -307,24 +307,38 @@ async def test_tts_for_step(
     
     logger.info(f"Testing TTS for step {step_id}: {text[:50]}...")
     
-    try:
-        from app.services.edge_tts_service import get_edge_tts_service
-        tts_service = get_edge_tts_service()
-        
-        # Генерируем аудио (БЕЗ "Шаг N")
-        audio_path = await tts_service.synthesize(text=text)
-        
-        # Возвращаем файл
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            audio_path,
-            media_type="audio/mpeg",
-            filename=f"step_{step_id}.mp3"
+    from fastapi.responses import StreamingResponse
+    from app.services import edge_tts_service
+    
+    if edge_tts_service.edge_tts is None:
+        raise HTTPException(
+            status_code=500,
+            detail="Edge TTS not installed. Run: pip install edge-tts"
         )
-        
+    
+    try:
+        stream = edge_tts_service.get_edge_tts_service().synthesize_stream(text)
+        # Первый чанк берём до ответа: после заголовков 200 ошибку синтеза
+        # клиент увидел бы только как обрезанный MP3
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="Edge TTS returned no audio")
     except Exception as e:
         logger.exception(f"TTS test failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def audio_chunks():
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+    
+    # Отдаём аудио потоком (БЕЗ "Шаг N") - плеер начинает играть
+    # с первого чанка, не дожидаясь синтеза всей фразы
+    return StreamingResponse(
+        audio_chunks(),
+        media_type="audio/mpeg",
+        headers={"Content-Disposition": f'attachment; filename="step_{step_id}.mp3"'}
+    )
 
 
 @router.get("/preview/{guide_id}")
@@ -394,7 +408,12 @@ async def _get_screenshot_url(key: str) -> str:
     return f"/api/v1/guides/screenshots{key}"
 
 
-def _estimate_tts_duration(text: str, words_per_second: float = 3.0) -> float:
-    """Оценить длительность TTS в секундах."""
-    word_count = len(text.split())
-    return max(2.0, word_count / words_per_second)
+def _estimate_tts_duration(text: str, chars_per_second: float = 15.0) -> float:
+    """
+    Оценить длительность TTS в секундах.
+    
+    Считаем по символам, а не по словам: паузы на знаках препинания и
+    длина слов учитываются сами собой, и не нужен split() всего текста.
+    15 символов в секунду - средняя скорость русских голосов.
+    """
+    return max(2.0, len(text) / chars_per_second)
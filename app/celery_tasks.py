@@ -9,7 +9,6 @@ Celery Tasks для AutoDoc AI System.
 - Heartbeat мониторинг через Redis
 """
 
-import json
 import logging
 import os
 import subprocess
@@ -17,12 +16,13 @@ import sys
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # Добавляем корень проекта в пути
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from app import ipc
 from app.celery import celery_app, heartbeat_manager
 from app.config import settings
 
@@ -48,79 +48,176 @@ def run_ai_subprocess(
     Returns:
         Результат выполнения
     """
-    # Формируем команду
-    script_path = settings.get_subprocess_script_path()
-    if not script_path.exists():
-        raise FileNotFoundError(f"AI Runner script not found: {script_path}")
-    
-    # Создаем временный файл с входными данными
-    input_file = settings.WORKER_TEMP_DIR / f"input_{task_id}.json"
-    output_file = settings.WORKER_TEMP_DIR / f"output_{task_id}.json"
+    if settings.AI_RUNNER_QUEUE:
+        return run_ai_in_pool(task_type, task_id, payload)
     
-    # Записываем входные данные
     input_data = {
         "task_type": task_type,
         "task_id": task_id,
         "payload": payload,
         "created_at": datetime.utcnow().isoformat(),
     }
+    return _run_runner_process(input_data, task_id, task_type)
+
+
+def run_ai_subprocess_batch(tasks: List[Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Запуск нескольких лёгких AI задач в одном subprocess.
+    
+    Для мелких задач (tts_generation, smart_alignment) старт интерпретатора
+    и импорты дороже самой работы - пачка платит их один раз.
+    
+    Args:
+        tasks: Список (task_type, task_id, payload)
+        
+    Returns:
+        Результаты в том же порядке
+    """
+    if settings.AI_RUNNER_QUEUE:
+        # Воркеры пула и так не платят за старт процесса
+        return [run_ai_in_pool(task_type, task_id, payload) for task_type, task_id, payload in tasks]
+    
+    created_at = datetime.utcnow().isoformat()
+    input_data = [
+        {
+            "task_type": task_type,
+            "task_id": task_id,
+            "payload": payload,
+            "created_at": created_at,
+        }
+        for task_type, task_id, payload in tasks
+    ]
+    batch_id = f"batch_{uuid.uuid4().hex[:8]}"
+    return _run_runner_process(input_data, batch_id, f"batch[{len(tasks)}]")
+
+
+def _run_runner_process(input_data: Any, task_id: str, task_type: str) -> Any:
+    """
+    Запуск ai_runner.py на входном JSON (задача или список задач).
     
-    with open(input_file, "w", encoding="utf-8") as f:
-        json.dump(input_data, f, ensure_ascii=False, indent=2)
+    Вход и результат передаются через stdin/stdout (--stdio), без
+    временных файлов, в msgpack если он доступен; логи subprocess идут в stderr.
     
+    Returns:
+        Разобранный JSON результата
+    """
     # Формируем команду
+    script_path = settings.get_subprocess_script_path()
+    if not script_path.exists():
+        raise FileNotFoundError(f"AI Runner script not found: {script_path}")
+    
+    fmt = ipc.default_format()
     cmd = [
         sys.executable,  # Текущий Python интерпретатор
         str(script_path),
-        "--input", str(input_file),
-        "--output", str(output_file),
+        "--stdio",
+        "--format", fmt,
     ]
     
     logger.info(f"Starting subprocess for task {task_type}/{task_id}")
     
     # Запускаем subprocess
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=str(PROJECT_ROOT),
+    )
+    
+    # Регистрируем в heartbeat
+    heartbeat_manager.register_job(task_id, f"subprocess:{task_type}")
+    
     try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=str(PROJECT_ROOT),
+        stdout, stderr = process.communicate(
+            input=ipc.encode(input_data, fmt),
+            timeout=settings.AI_PROCESS_TIMEOUT,
         )
-        
-        # Регистрируем в heartbeat
-        heartbeat_manager.register_job(task_id, f"subprocess:{task_type}")
-        
-        # Ждем завершения
-        stdout, stderr = process.communicate(timeout=settings.AI_PROCESS_TIMEOUT)
-        
-        # Удаляем из heartbeat
-        heartbeat_manager.unregister_job(task_id)
-        
-        # Читаем результат
-        if output_file.exists():
-            with open(output_file, "r", encoding="utf-8") as f:
-                result = json.load(f)
-            
-            # Чистим временные файлы
-            input_file.unlink(missing_ok=True)
-            output_file.unlink(missing_ok=True)
-            
-            return result
-        else:
-            raise RuntimeError(f"Subprocess completed but no output file: {output_file}")
-    
     except subprocess.TimeoutExpired:
         process.kill()
-        stdout, stderr = process.communicate()
-        heartbeat_manager.unregister_job(task_id)
+        process.communicate()
         raise TimeoutError(f"AI subprocess timeout after {settings.AI_PROCESS_TIMEOUT}s")
+    finally:
+        heartbeat_manager.unregister_job(task_id)
     
-    except Exception as e:
+    if not stdout:
+        tail = stderr.decode("utf-8", errors="replace")[-2000:]
+        raise RuntimeError(
+            f"Subprocess exited with code {process.returncode} and no result: {tail}"
+        )
+    
+    return ipc.decode(stdout, fmt)
+
+
+# Redis-клиент пула ai_runner: один на процесс воркера (см. _get_pool_redis)
+_pool_redis = None
+_pool_redis_pid: Optional[int] = None
+
+
+def _get_pool_redis():
+    """
+    Redis-клиент для run_ai_in_pool.
+    
+    Создаётся лениво и переиспользуется всеми задачами процесса; после
+    fork (prefork-пул Celery) дочерний процесс заводит свой клиент.
+    """
+    global _pool_redis, _pool_redis_pid
+    
+    if _pool_redis is None or _pool_redis_pid != os.getpid():
+        import redis
+        
+        # Без decode_responses: сообщения бинарные (msgpack)
+        _pool_redis = redis.from_url(settings.redis_url)
+        _pool_redis_pid = os.getpid()
+    return _pool_redis
+
+
+def run_ai_in_pool(
+    task_type: str,
+    task_id: str,
+    payload: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Запуск AI задачи в долгоживущем пуле ai_runner.py --serve.
+    
+    Задача кладётся в Redis-список AI_RUNNER_QUEUE, результат
+    забирается из отдельного ключа. Воркеры пула уже держат
+    интерпретатор и тяжёлые модули в памяти.
+    
+    Args:
+        task_type: Тип задачи
+        task_id: Уникальный ID задачи
+        payload: Данные задачи
+        
+    Returns:
+        Результат выполнения
+    """
+    redis_client = _get_pool_redis()
+    # Ключ уникален для каждого запуска: повтор задачи с тем же task_id
+    # не заберёт запоздавший результат предыдущей попытки
+    result_key = f"{settings.AI_RUNNER_QUEUE}:result:{task_id}:{uuid.uuid4().hex}"
+    
+    input_data = {
+        "task_type": task_type,
+        "task_id": task_id,
+        "payload": payload,
+        "result_key": result_key,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    
+    logger.info(f"Queueing task {task_type}/{task_id} to {settings.AI_RUNNER_QUEUE}")
+    
+    heartbeat_manager.register_job(task_id, f"pool:{task_type}")
+    try:
+        redis_client.rpush(settings.AI_RUNNER_QUEUE, ipc.encode(input_data, ipc.default_format()))
+        popped = redis_client.blpop(result_key, timeout=settings.AI_PROCESS_TIMEOUT)
+    finally:
         heartbeat_manager.unregister_job(task_id)
-        # Чистим временные файлы
-        input_file.unlink(missing_ok=True)
-        output_file.unlink(missing_ok=True)
-        raise
+    
+    if popped is None:
+        raise TimeoutError(f"AI pool timeout after {settings.AI_PROCESS_TIMEOUT}s")
+    
+    return ipc.decode(popped[1])
 
 
 # === Task Definitions (Lightweight Wrappers) ===
@@ -499,6 +596,7 @@ def cleanup_temp_files(max_age_hours: int = 24) -> Dict[str, Any]:
     from pathlib import Path
     from datetime import datetime, timedelta
     import shutil
+    from app.services import tts_cache
     
     temp_dir = settings.WORKER_TEMP_DIR
     
@@ -509,6 +607,9 @@ def cleanup_temp_files(max_age_hours: int = 24) -> Dict[str, Any]:
     deleted_count = 0
     
     for item in temp_dir.iterdir():
+        # Кэш TTS ограничивает свой размер сам (tts_cache.evict)
+        if item.name == tts_cache.CACHE_DIR_NAME:
+            continue
         try:
             mtime = datetime.fromtimestamp(item.stat().st_mtime)
             
@@ -600,15 +701,14 @@ def generate_video_task(
         )
         
         # Генерируем TTS для каждого шага
-        from app.services.edge_tts_service import EdgeTTSService
+        from app.services.edge_tts_service import EdgeTTSService, format_prosody
         from app.services.chatterbox_service import get_chatterbox_service
         from app.services.silero_tts_service import get_silero_service, DEFAULT_SPEAKER
 
         # Создаем TTS сервис с нужными параметрами
         if tts_engine == "edge":
             # Форматируем параметры для Edge TTS
-            rate_str = f"{int((tts_speed - 1.0) * 100):+d}%"
-            pitch_str = f"{int(tts_pitch):+d}Hz"
+            rate_str, pitch_str = format_prosody(tts_speed, tts_pitch)
             tts_service = EdgeTTSService(voice=tts_voice, rate=rate_str, pitch=pitch_str)
         elif tts_engine == "silero":
             # Для Silero tts_voice — это имя голоса (xenia/baya/eugene/...)
@@ -617,29 +717,38 @@ def generate_video_task(
         else:
             tts_service = get_chatterbox_service()
         
-        audio_files = []
-        for idx, step in enumerate(steps):
-            progress = 10 + int((idx / total_steps) * 40)  # 10-50%
+        texts = [step.edited_text or step.normalized_text for step in steps]
+        
+        def report_tts_progress(done: int, total: int) -> None:
             self.update_state(
                 state='PROGRESS',
                 meta={
-                    'progress': progress,
-                    'message': f'Генерация TTS для шага {idx + 1}/{total_steps}'
+                    'progress': 10 + int((done / total) * 40),  # 10-50%
+                    'message': f'Генерация TTS: готово {done}/{total}'
                 }
             )
-            
-            text = step.edited_text or step.normalized_text
-            
-            # Генерируем аудио (БЕЗ "Шаг N")
-            # Используем синхронный метод для Celery
-            if tts_engine == "edge":
-                audio_path = tts_service.synthesize_sync(text=text)
-            else:
-                audio_path = tts_service.synthesize_sync(text=text)
-            
+        
+        # Генерируем аудио (БЕЗ "Шаг N")
+        if tts_engine == "edge":
+            # Edge TTS упирается в сеть - все шаги синтезируются конкурентно
+            audio_paths = tts_service.synthesize_batch_sync(
+                texts, progress_callback=report_tts_progress
+            )
+        else:
+            # Локальные модели (Silero/Chatterbox) и так занимают все ядра
+            # через intra-op потоки torch, а пул процессов продублировал бы
+            # модель в памяти каждого процесса - синтезируем по очереди
+            audio_paths = []
+            for idx, text in enumerate(texts):
+                report_tts_progress(idx, total_steps)
+                audio_paths.append(tts_service.synthesize_sync(text=text))
+        
+        audio_files = []
+        for step, audio_path in zip(steps, audio_paths):
             audio_files.append({
                 "step_number": step.step_number,
                 "audio_path": audio_path,
+                "duration": tts_service.get_audio_duration(audio_path),
                 "screenshot_path": f"/data/{step.screenshot_path}",
                 "click_x": step.click_x,
                 "click_y": step.click_y,
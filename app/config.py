@@ -113,6 +113,10 @@ class Settings(BaseSettings):
         default=3600, 
         description="Hard timeout для subprocess AI в секундах (1 час)"
     )
+    AI_RUNNER_QUEUE: Optional[str] = Field(
+        default=None,
+        description="Redis-очередь пула AI Runner (ai_runner.py --serve); None - subprocess на задачу"
+    )
     GPU_DEVICE_ID: int = Field(default=0, description="ID GPU устройства для CUDA")
     GPU_MEMORY_FRACTION: float = Field(
         default=0.8, 
@@ -209,6 +213,15 @@ class Settings(BaseSettings):
     VIDEO_OUTPUT_HEIGHT: int = Field(default=1080, description="Высота выходного видео")
     VIDEO_FPS: int = Field(default=30, description="Кадров в секунду")
     VIDEO_QUALITY: str = Field(default="high", description="Качество видео (low/medium/high)")
+    VIDEO_HW_ENCODER: str = Field(
+        default="auto",
+        description="H.264 энкодер: auto (NVENC/QSV при наличии), none (libx264) или имя энкодера"
+    )
+    FFMPEG_THREADS: int = Field(
+        default=4,
+        ge=1,
+        description="Потоков кодирования и фильтров на один процесс FFmpeg"
+    )
     
     # Настройки для Shorts/Reels
     SHORTS_WIDTH: int = Field(default=1080, description="Ширина для Shorts")
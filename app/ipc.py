@@ -0,0 +1,80 @@
+"""
+Формат обмена задачами между celery_tasks.py и workers/ai_runner.py.
+
+msgpack компактнее и быстрее JSON на больших списках (click_events,
+voice_segments, screen_actions). Если он не установлен - JSON через
+orjson или stdlib json.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:  # msgpack ставится из requirements.txt
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # orjson ставится из requirements.txt
+    orjson = None
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+FORMATS = (FORMAT_JSON, FORMAT_MSGPACK)
+
+
+def default_format() -> str:
+    """Формат для новых сообщений: msgpack, если он доступен."""
+    return FORMAT_MSGPACK if msgpack is not None else FORMAT_JSON
+
+
+def detect_format(data: bytes) -> str:
+    """
+    Определить формат по первому байту.
+
+    Задача и результат - объект или список: в JSON это "{" / "[", а в
+    msgpack map/array никогда не начинается с этих байтов.
+    """
+    if msgpack is None or data.lstrip()[:1] in (b"{", b"["):
+        return FORMAT_JSON
+    return FORMAT_MSGPACK
+
+
+def _default(obj: Any) -> Any:
+    """Типы, которые msgpack и stdlib json не знают: datetime и numpy."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def encode(obj: Any, fmt: str = FORMAT_JSON) -> bytes:
+    """Сериализовать сообщение в байты."""
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack не установлен. Установите: pip install msgpack")
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def decode(data: bytes, fmt: Optional[str] = None) -> Any:
+    """
+    Разобрать сообщение.
+
+    Без fmt формат определяется по содержимому (см. detect_format).
+    Ошибки разбора - ValueError для обоих форматов (в msgpack>=1.0
+    исключения распаковки наследуют ValueError).
+    """
+    fmt = fmt or detect_format(data)
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack не установлен. Установите: pip install msgpack")
+        return msgpack.unpackb(data, raw=False)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -20,7 +20,7 @@ from datetime import datetime
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy import text
@@ -68,8 +68,9 @@ async def lifespan(app: FastAPI):
     # Проверяем соединение с хранилищем
     try:
         from app.services.storage import storage_service
-        # Проверяем что базовая директория существует и доступна
-        storage_service.base_path.exists()
+        # Проверяем что все папки хранилища существуют и доступны
+        if not storage_service.check_connection(verbose=True):
+            raise RuntimeError(f"{storage_service.base_path} is not accessible")
         logger.info(f"Storage initialized at {storage_service.base_path}")
     except Exception as e:
         logger.warning(f"Storage initialization failed: {e}")
@@ -130,6 +131,8 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
+    # orjson сериализует datetime/UUID нативно и быстрее stdlib json
+    default_response_class=ORJSONResponse,
     lifespan=lifespan,
 )
 
@@ -275,8 +278,9 @@ async def health_check() -> HealthCheckResponse:
     storage_status = "healthy"
     try:
         from app.services.storage import storage_service
-        # Проверяем что базовая директория существует и доступна
-        storage_service.base_path.exists()
+        # Проверяем что хранилище доступно (результат кэшируется на пару секунд)
+        if not storage_service.check_connection():
+            storage_status = "unhealthy: storage is not accessible"
     except Exception as e:
         storage_status = f"unhealthy: {e}"
     
@@ -20,8 +20,6 @@ from typing import Optional, Dict, Any, List, Tuple, Type
 from enum import Enum
 from functools import lru_cache
 
-import torch
-
 from app.config import settings
 
 
@@ -5,12 +5,16 @@ https://github.com/resemble-ai/chatterbox
 
 import logging
 from pathlib import Path
-from typing import Optional
-import tempfile
+from typing import Dict, Optional
 import re
 
+from app.services import tts_cache
+
 logger = logging.getLogger(__name__)
 
+# Сколько длительностей синтезированных файлов помнит сервис
+DURATION_CACHE_SIZE = 1024
+
 
 def transliterate_for_russian_tts(text: str) -> str:
     """
@@ -67,6 +71,9 @@ class ChatterboxService:
     
     _instance = None
     _model = None
+    _device = "cpu"
+    # Длительности синтезированных файлов, посчитанные по числу сэмплов
+    _durations: Dict[str, float] = {}
     
     def __new__(cls):
         if cls._instance is None:
@@ -81,9 +88,14 @@ class ChatterboxService:
         try:
             # Используем MULTILINGUAL модель для поддержки русского языка
             from chatterbox.mtl_tts import ChatterboxMultilingualTTS
+            import torch
             
-            logger.info("Loading Chatterbox Multilingual TTS model (first time only)...")
-            self._model = ChatterboxMultilingualTTS.from_pretrained(device="cpu")
+            # На GPU модель работает на порядок быстрее, CPU - запасной вариант
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            
+            logger.info(f"Loading Chatterbox Multilingual TTS model on {device} (first time only)...")
+            self._model = ChatterboxMultilingualTTS.from_pretrained(device=device)
+            self._device = device
             logger.info("Chatterbox Multilingual TTS model loaded successfully")
             
         except ImportError as e:
@@ -111,19 +123,36 @@ class ChatterboxService:
             Путь к WAV файлу с аудио
         """
         try:
-            logger.info(f"Synthesizing TTS for text: {text[:50]}...")
+            # Без явного пути результат кладётся в кэш TTS
+            cache_key = None
+            if not output_path:
+                cache_key = tts_cache.cache_key("chatterbox", "ru", text)
+                cached_path = tts_cache.lookup(cache_key, ".wav")
+                if cached_path:
+                    logger.info(f"TTS cache hit: {cached_path}")
+                    return cached_path
             
-            # Генерируем аудио через метод generate с указанием русского языка
-            audio_tensor = self._model.generate(text=text, language_id="ru")
+            logger.info(f"Synthesizing TTS for text: {text[:50]}...")
             
-            # Конвертируем tensor в numpy array
             import torch
             import numpy as np
+            
+            # Генерируем аудио через метод generate с указанием русского языка.
+            # Голос - встроенные conditionals модели, они посчитаны при загрузке
+            # и не пересчитываются на каждый вызов. На GPU считаем в fp16.
+            with torch.inference_mode(), torch.autocast(
+                device_type="cuda",
+                dtype=torch.float16,
+                enabled=self._device == "cuda",
+            ):
+                audio_tensor = self._model.generate(text=text, language_id="ru")
+            
+            # Конвертируем tensor в numpy array
             import scipy.io.wavfile as wavfile
             
             # Преобразуем tensor в numpy
             if isinstance(audio_tensor, torch.Tensor):
-                audio_np = audio_tensor.cpu().numpy()
+                audio_np = audio_tensor.float().cpu().numpy()
             else:
                 audio_np = np.array(audio_tensor)
             
@@ -147,15 +176,14 @@ class ChatterboxService:
                 save_path = output_path
                 Path(output_path).parent.mkdir(parents=True, exist_ok=True)
             else:
-                temp_file = tempfile.NamedTemporaryFile(
-                    suffix='.wav',
-                    delete=False
-                )
-                save_path = temp_file.name
-                temp_file.close()
+                save_path = tts_cache.temp_path(".wav")
             
-            # Сохраняем как WAV (22050 Hz - стандарт для Chatterbox)
-            wavfile.write(save_path, 22050, audio_np)
+            # Сохраняем как WAV с частотой самой модели (у Chatterbox 24 кГц)
+            sample_rate = getattr(self._model, "sr", 22050)
+            wavfile.write(save_path, sample_rate, audio_np)
+            if cache_key:
+                save_path = tts_cache.store(cache_key, ".wav", save_path)
+            self._remember_duration(save_path, len(audio_np) / sample_rate)
             logger.info(f"Saved audio to {save_path}")
             return save_path
                 
@@ -163,6 +191,12 @@ class ChatterboxService:
             logger.error(f"TTS synthesis failed: {e}")
             raise
     
+    def _remember_duration(self, audio_path: str, duration: float) -> None:
+        """Запомнить длительность синтезированного файла для get_audio_duration."""
+        if len(self._durations) >= DURATION_CACHE_SIZE:
+            self._durations.pop(next(iter(self._durations)))
+        self._durations[audio_path] = duration
+    
     def synthesize_sync(
         self,
         text: str,
@@ -184,6 +218,9 @@ class ChatterboxService:
         """
         Получить длительность аудио в секундах.
         """
+        if audio_path in self._durations:
+            return self._durations[audio_path]
+        
         try:
             import wave
             
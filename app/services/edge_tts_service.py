@@ -4,13 +4,137 @@ Edge TTS Service - быстрая онлайн озвучка от Microsoft
 
 import logging
 import asyncio
+import json
+import os
 import re
+import subprocess
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-import tempfile
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+try:
+    import edge_tts
+except ImportError:  # edge-tts ставится из requirements.txt
+    edge_tts = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop приходит с uvicorn[standard] (кроме Windows)
+    uvloop = None
+
+from app.config import settings
+from app.services import tts_cache
 
 logger = logging.getLogger(__name__)
 
+# Edge TTS отдаёт MP3 "audio-24khz-48kbitrate-mono-mp3" (CBR): 48 кбит/с = 6000 байт/с
+EDGE_MP3_BYTES_PER_SECOND = 6000
+
+# Сколько длительностей синтезированных файлов помнит сервис
+DURATION_CACHE_SIZE = 1024
+
+# Тексты длиннее порога режутся по предложениям и синтезируются параллельно
+SPLIT_THRESHOLD_CHARS = 1000
+SPLIT_CHUNK_CHARS = 400
+# Не больше стольких одновременных websocket-потоков (троттлинг Microsoft)
+MAX_PARALLEL_STREAMS = 4
+
+# Список голосов кэшируется на диске на сутки - переживает рестарт воркера
+VOICES_CACHE_FILE = "edge_voices.json"
+VOICES_CACHE_TTL = 24 * 3600
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+')
+
+
+@lru_cache(maxsize=256)
+def _probe_duration(path: str, size: int, mtime_ns: int) -> float:
+    """
+    Длительность аудио через ffprobe (только заголовок контейнера, без декодирования).
+    
+    size и mtime_ns - часть ключа кэша: перезаписанный файл пробуется заново.
+    """
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "csv=p=0",
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=10,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()}")
+    return float(result.stdout.strip())
+
+
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _run_sync(coro):
+    """
+    Выполнить корутину из синхронного кода (Celery).
+    
+    Event loop создаётся один раз на процесс и переиспользуется: раньше
+    каждый шаг создавал и закрывал свой loop (селектор, пул потоков DNS).
+    Сам websocket edge_tts открывает заново на каждый Communicate, и
+    подсунуть ему общий aiohttp-коннектор нельзя - его ClientSession
+    владеет коннектором и закрывает его после первого запроса.
+    Если установлен uvloop, loop берётся из него.
+    """
+    global _sync_loop
+    if _sync_loop is None or _sync_loop.is_closed():
+        _sync_loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    asyncio.set_event_loop(_sync_loop)
+    return _sync_loop.run_until_complete(coro)
+
+
+def _write_chunks(path: str, chunks: List[bytearray]) -> None:
+    """Записать собранные куски аудио в файл (вызывается из пула потоков)."""
+    with open(path, "wb") as f:
+        f.writelines(chunks)
+
+
+def _split_sentences(text: str, max_chars: int = SPLIT_CHUNK_CHARS) -> List[str]:
+    """
+    Разбить текст на куски по границам предложений.
+    
+    Соседние короткие предложения склеиваются, пока кусок не превысит max_chars,
+    чтобы не плодить websocket-запросы на каждую фразу.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@lru_cache(maxsize=64)
+def format_prosody(speed: float, pitch: float) -> Tuple[str, str]:
+    """
+    Перевести скорость и тембр в строки параметров Edge TTS.
+    
+    Args:
+        speed: Множитель скорости (1.0 — без изменений, 1.2 — на 20% быстрее)
+        pitch: Сдвиг тембра в герцах
+        
+    Returns:
+        (rate, pitch), например ("+20%", "-5Hz")
+    """
+    # round, а не int: int((0.9 - 1.0) * 100) даёт -9 из-за погрешности float
+    return f"{round((speed - 1.0) * 100):+d}%", f"{round(pitch):+d}Hz"
+
 
 def normalize_text_for_edge_tts(text: str) -> str:
     """
@@ -138,6 +262,10 @@ class EdgeTTSService:
     Быстро, качественно, но требует интернет.
     """
     
+    # Общий для всех экземпляров: Celery создаёт сервис на каждую задачу
+    _voices_cache: Optional[List[Dict[str, Any]]] = None
+    _russian_cache: Optional[List[Dict[str, Any]]] = None
+    
     def __init__(self, voice: str = "ru-RU-DmitryNeural", rate: str = "+20%", pitch: str = "+0Hz"):
         """
         Args:
@@ -148,6 +276,10 @@ class EdgeTTSService:
         self.voice = voice
         self.rate = rate
         self.pitch = pitch
+        # Длительности файлов, посчитанные прямо во время синтеза (без ffprobe)
+        self._durations: Dict[str, float] = {}
+        # Синтезы, идущие прямо сейчас: ключ кэша -> future с путём к файлу
+        self._inflight: Dict[str, asyncio.Future] = {}
         logger.info(f"Edge TTS service initialized with voice: {voice}, rate: {rate}, pitch: {pitch}")
     
     async def synthesize(
@@ -171,22 +303,16 @@ class EdgeTTSService:
             # Нормализуем текст для Edge TTS
             normalized_text = normalize_text_for_edge_tts(text)
             
-            # Определяем путь для сохранения
-            if output_path:
-                save_path = output_path
-                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-            else:
-                temp_file = tempfile.NamedTemporaryFile(
-                    suffix='.mp3',
-                    delete=False
-                )
-                save_path = temp_file.name
-                temp_file.close()
+            # Без явного пути результат кладётся в кэш TTS
+            if not output_path:
+                return await self._synthesize_cached(normalized_text)
+            
+            save_path = output_path
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
             
             # Генерируем аудио с нормализованным текстом
-            import edge_tts
-            communicate = edge_tts.Communicate(normalized_text, self.voice, rate=self.rate, pitch=self.pitch)
-            await communicate.save(save_path)
+            duration = await self._stream_to_file(normalized_text, save_path)
+            self._remember_duration(save_path, duration)
             
             logger.info(f"Saved audio to {save_path}")
             return save_path
@@ -195,6 +321,135 @@ class EdgeTTSService:
             logger.error(f"TTS synthesis failed: {e}")
             raise
     
+    async def _synthesize_cached(self, normalized_text: str) -> str:
+        """
+        Синтез через кэш TTS.
+        
+        Одинаковые запросы, пришедшие одновременно (пока файла в кэше ещё
+        нет), ждут один общий синтез, а не запускают каждый свой.
+        """
+        cache_key = tts_cache.cache_key(
+            "edge", self.voice, self.rate, self.pitch, normalized_text
+        )
+        cached_path = tts_cache.lookup(cache_key, ".mp3")
+        if cached_path:
+            logger.info(f"TTS cache hit: {cached_path}")
+            return cached_path
+        
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            logger.info("Identical TTS request in flight, waiting for it")
+            # shield: отмена ожидающего не должна отменять общий синтез
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            save_path = tts_cache.temp_path(".mp3")
+            duration = await self._stream_to_file(normalized_text, save_path)
+            save_path = tts_cache.store(cache_key, ".mp3", save_path)
+            self._remember_duration(save_path, duration)
+            logger.info(f"Saved audio to {save_path}")
+            future.set_result(save_path)
+            return save_path
+        except Exception as e:
+            future.set_exception(e)
+            # Помечаем исключение прочитанным, если ожидающих не было
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._inflight[cache_key]
+    
+    async def synthesize_stream(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Потоковый синтез: MP3-чанки отдаются по мере прихода из websocket,
+        не дожидаясь конца фразы (воспроизведение начинается с первого чанка).
+        
+        Args:
+            text: Текст для озвучки
+        
+        Yields:
+            Куски MP3-потока
+        """
+        if edge_tts is None:
+            raise ImportError("Edge TTS not installed. Run: pip install edge-tts")
+        
+        normalized_text = normalize_text_for_edge_tts(text)
+        communicate = edge_tts.Communicate(
+            normalized_text, self.voice, rate=self.rate, pitch=self.pitch
+        )
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+    
+    async def _stream_to_file(self, text: str, save_path: str) -> float:
+        """
+        Синтез в файл. Длинный текст режется по предложениям, куски
+        синтезируются параллельно (не больше MAX_PARALLEL_STREAMS потоков)
+        и склеиваются побайтово - MP3-фреймы самосинхронизирующиеся.
+        
+        Поток собирается в памяти и пишется на диск одним вызовом в пуле
+        потоков: event loop не блокируется на файловом I/O и продолжает
+        принимать чанки других одновременных синтезов.
+        
+        Returns:
+            Длительность аудио в секундах, посчитанная по самому потоку
+        """
+        parts = _split_sentences(text) if len(text) > SPLIT_THRESHOLD_CHARS else [text]
+        
+        if len(parts) == 1:
+            buffer = bytearray()
+            duration = await self._stream(text, buffer.extend)
+            await asyncio.to_thread(_write_chunks, save_path, [buffer])
+            return duration
+        
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_STREAMS)
+        
+        async def render(part: str) -> Tuple[bytearray, float]:
+            buffer = bytearray()
+            async with semaphore:
+                duration = await self._stream(part, buffer.extend)
+            return buffer, duration
+        
+        logger.info(f"Synthesizing {len(parts)} chunks in parallel")
+        results = await asyncio.gather(*(render(part) for part in parts))
+        
+        await asyncio.to_thread(_write_chunks, save_path, [buffer for buffer, _ in results])
+        return sum(duration for _, duration in results)
+    
+    async def _stream(self, text: str, write: Callable[[bytes], Any]) -> float:
+        """
+        Синтез в том же процессе через edge_tts.Communicate.stream():
+        аудио-чанки отдаются в write() по мере прихода из websocket.
+        
+        Returns:
+            Длительность аудио в секундах
+        """
+        if edge_tts is None:
+            raise ImportError("Edge TTS not installed. Run: pip install edge-tts")
+        
+        communicate = edge_tts.Communicate(text, self.voice, rate=self.rate, pitch=self.pitch)
+        audio_bytes = 0
+        last_end = 0  # Конец последнего слова/предложения, в единицах 100 нс
+        
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                write(chunk["data"])
+                audio_bytes += len(chunk["data"])
+            elif chunk["type"] in ("WordBoundary", "SentenceBoundary"):
+                last_end = max(last_end, chunk["offset"] + chunk["duration"])
+        
+        # Границы дают конец речи, объём CBR-потока - ещё и хвостовую паузу
+        return max(last_end / 1e7, audio_bytes / EDGE_MP3_BYTES_PER_SECOND)
+    
+    def _remember_duration(self, audio_path: str, duration: float) -> None:
+        """Запомнить длительность синтезированного файла для get_audio_duration."""
+        if len(self._durations) >= DURATION_CACHE_SIZE:
+            self._durations.pop(next(iter(self._durations)))
+        self._durations[audio_path] = duration
+    
     def synthesize_sync(
         self,
         text: str,
@@ -202,7 +457,7 @@ class EdgeTTSService:
     ) -> str:
         """
         Синхронный метод синтеза речи (для Celery).
-        Создаёт новый event loop для выполнения async операции.
+        Выполняется в общем event loop процесса (см. _run_sync).
         
         Args:
             text: Текст для озвучки
@@ -211,32 +466,118 @@ class EdgeTTSService:
         Returns:
             Путь к MP3 файлу с аудио
         """
-        import asyncio
+        return _run_sync(self.synthesize(text, output_path))
+    
+    async def synthesize_batch(
+        self,
+        texts: List[str],
+        parallel: int = MAX_PARALLEL_STREAMS,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[str]:
+        """
+        Синтез нескольких текстов конкурентно в одном event loop.
+        
+        Edge TTS упирается в сеть, а не в CPU, поэтому достаточно семафора:
+        пока один запрос ждёт websocket, другие уже синтезируются.
+        
+        Args:
+            texts: Тексты для озвучки
+            parallel: Максимум одновременных запросов
+            progress_callback: Функция (готово, всего), вызывается по мере готовности
+        
+        Returns:
+            Пути к MP3 файлам в порядке texts
+        """
+        semaphore = asyncio.Semaphore(parallel)
+        done = 0
+        
+        async def render(text: str) -> str:
+            nonlocal done
+            async with semaphore:
+                path = await self.synthesize(text)
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(texts))
+            return path
+        
+        return list(await asyncio.gather(*(render(text) for text in texts)))
+    
+    def synthesize_batch_sync(
+        self,
+        texts: List[str],
+        parallel: int = MAX_PARALLEL_STREAMS,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[str]:
+        """Синхронная версия synthesize_batch (для Celery)."""
+        return _run_sync(self.synthesize_batch(texts, parallel, progress_callback))
+    
+    async def get_available_voices(self) -> List[Dict[str, Any]]:
+        """
+        Список голосов Edge TTS.
         
-        # Создаём новый event loop для синхронного вызова
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        Порядок поиска: память -> файл в WORKER_TEMP_DIR (не старше суток) ->
+        edge_tts.list_voices(). Свежий список пишется на диск атомарно.
+        """
+        if EdgeTTSService._voices_cache is not None:
+            return EdgeTTSService._voices_cache
         
+        cache_path = Path(settings.WORKER_TEMP_DIR) / VOICES_CACHE_FILE
         try:
-            return loop.run_until_complete(self.synthesize(text, output_path))
-        finally:
-            loop.close()
+            if time.time() - cache_path.stat().st_mtime < VOICES_CACHE_TTL:
+                return self._set_voices(json.loads(cache_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Voices cache miss: {e}")
+        
+        if edge_tts is None:
+            raise ImportError("Edge TTS not installed. Run: pip install edge-tts")
+        
+        voices = self._set_voices(await edge_tts.list_voices())
+        
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(voices, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to persist voices cache: {e}")
+        
+        logger.info(f"Loaded {len(voices)} Edge TTS voices")
+        return voices
+    
+    async def get_russian_voices(self) -> List[Dict[str, Any]]:
+        """Голоса Edge TTS для русского языка (фильтр считается один раз)."""
+        await self.get_available_voices()
+        return EdgeTTSService._russian_cache
+    
+    @staticmethod
+    def _set_voices(voices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Заполнить кэш голосов вместе с отфильтрованным русским списком."""
+        # Locale в ответе Edge канонический ("ru-RU"), lower() не нужен
+        EdgeTTSService._russian_cache = [v for v in voices if v.get("Locale", "").startswith("ru-")]
+        EdgeTTSService._voices_cache = voices
+        return voices
     
     def get_audio_duration(self, audio_path: str) -> float:
         """
         Получить длительность аудио в секундах.
+        
+        Для файлов, синтезированных этим сервисом (в том числе взятых из
+        кэша TTS), ffprobe не вызывается.
         """
+        if audio_path in self._durations:
+            return self._durations[audio_path]
+        
         try:
-            from pydub import AudioSegment
-            
-            audio = AudioSegment.from_file(audio_path)
-            return len(audio) / 1000.0  # миллисекунды в секунды
+            st = os.stat(audio_path)
+            # MP3 в кэше TTS записан этим сервисом (CBR) - считаем по размеру,
+            # без запуска ffprobe на каждое попадание в кэш
+            if audio_path.endswith(".mp3") and tts_cache.is_cached(audio_path):
+                return st.st_size / EDGE_MP3_BYTES_PER_SECOND
+            return _probe_duration(audio_path, st.st_size, st.st_mtime_ns)
                 
         except Exception as e:
             logger.error(f"Failed to get audio duration: {e}")
-            # Примерная оценка: 3 слова в секунду
-            word_count = len(text.split()) if 'text' in locals() else 10
-            return max(2.0, word_count / 3.0)
+            return 0.0
 
 
 # Глобальный экземпляр сервиса
@@ -292,7 +292,12 @@ def generate_marker_overlay(
     ]
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=30
+        )
         return result.returncode == 0 and Path(output_path).exists()
     except Exception as e:
         logger.error(f"Marker overlay failed: {e}")
@@ -12,7 +12,7 @@ from dataclasses import dataclass
 from datetime import datetime
 
 from app.config import settings
-from app.services.chatterbox_service import ChatterboxService
+from app.services import tts_cache
 
 logger = logging.getLogger(__name__)
 
@@ -110,7 +110,9 @@ class ShortsGenerator:
                 
                 # Генерируем TTS через Edge TTS (асинхронный вызов)
                 tts_audio_path = await tts_service.synthesize(text=text)
-                temp_files.append(tts_audio_path)
+                # Файлы из кэша TTS переиспользуются - их не удаляем
+                if not tts_cache.is_cached(tts_audio_path):
+                    temp_files.append(tts_audio_path)
                 
                 # Получаем длительность аудио
                 duration = tts_service.get_audio_duration(tts_audio_path) or 3.0
@@ -171,6 +173,8 @@ class ShortsGenerator:
             # FFmpeg concat
             cmd = [
                 "ffmpeg",
+                "-hide_banner",
+                "-loglevel", "error",
                 "-y",
                 "-f", "concat",
                 "-safe", "0",
@@ -180,7 +184,13 @@ class ShortsGenerator:
                 str(output_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
             
             if result.returncode == 0 and output_path.exists():
                 duration = self._get_duration(str(output_path))
@@ -299,6 +309,8 @@ class ShortsGenerator:
         # Формируем команду
         cmd = [
             "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
             "-y",
             "-loop", "1",
             "-i", str(screenshot_path),
@@ -324,14 +336,19 @@ class ShortsGenerator:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=60
+            )
             
             if result.returncode == 0 and output_path.exists():
                 return str(output_path)
             else:
                 logger.error(f"FFmpeg command failed with return code {result.returncode}")
                 logger.error(f"FFmpeg stderr: {result.stderr}")
-                logger.error(f"FFmpeg stdout: {result.stdout}")
                 return None
                 
         except Exception as e:
@@ -387,6 +404,8 @@ class ShortsGenerator:
         # Создаём чёрный фон с текстом
         cmd = [
             "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
             "-y",
             "-f", "lavfi",
             "-i", f"color=c=black:s={self.width}x{self.height}:d={intro_duration}",
@@ -401,7 +420,13 @@ class ShortsGenerator:
             str(intro_video)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=30
+        )
         
         if result.returncode != 0:
             logger.warning(f"Intro creation failed: {result.stderr}")
@@ -412,6 +437,8 @@ class ShortsGenerator:
         
         concat_cmd = [
             "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
             "-y",
             "-f", "concat",
             "-safe", "0",
@@ -421,7 +448,13 @@ class ShortsGenerator:
             final_output
         ]
         
-        final_result = subprocess.run(concat_cmd, capture_output=True, text=True, timeout=300)
+        final_result = subprocess.run(
+            concat_cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=300
+        )
         
         # Удаляем временный интро
         try:
@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
+from app.services import tts_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -147,7 +149,9 @@ class ShortsGeneratorSync:
                     logger.error(f"[SYNC] TTS failed for step {i+1}")
                     continue
                 
-                temp_files.append(tts_audio_path)
+                # Файлы из кэша TTS переиспользуются - их не удаляем
+                if not tts_cache.is_cached(tts_audio_path):
+                    temp_files.append(tts_audio_path)
                 
                 # Получаем длительность
                 duration = tts_service.get_audio_duration(tts_audio_path) or 3.0
@@ -216,6 +220,8 @@ class ShortsGeneratorSync:
             
             cmd = [
                 "ffmpeg",
+                "-hide_banner",
+                "-loglevel", "error",
                 "-y",
                 "-f", "concat",
                 "-safe", "0",
@@ -225,7 +231,13 @@ class ShortsGeneratorSync:
                 str(output_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=300
+            )
             
             if result.returncode == 0 and output_path.exists():
                 duration = self._get_duration(str(output_path))
@@ -329,6 +341,8 @@ class ShortsGeneratorSync:
         # Генерируем видео из обработанного скриншота
         cmd = [
             "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
             "-y",
             "-loop", "1",
             "-t", str(segment.duration_seconds),
@@ -343,7 +357,13 @@ class ShortsGeneratorSync:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=60
+            )
             
             # Удаляем обработанный скриншот если он был создан
             if processed_screenshot != str(screenshot_path):
@@ -355,7 +375,6 @@ class ShortsGeneratorSync:
             else:
                 logger.error(f"[SYNC] FFmpeg failed with code {result.returncode}")
                 logger.error(f"[SYNC] FFmpeg stderr: {result.stderr}")
-                logger.error(f"[SYNC] FFmpeg stdout: {result.stdout}")
                 return None
                 
         except Exception as e:
@@ -518,6 +537,7 @@ def generate_video_from_steps(
         steps: Список шагов с полями:
             - step_number: int
             - audio_path: str (путь к TTS аудио)
+            - duration: float (длительность аудио, опционально - иначе ffprobe)
             - screenshot_path: str (полный путь)
             - click_x, click_y: int
         guide_uuid: UUID гайда
@@ -554,7 +574,7 @@ def generate_video_from_steps(
                 marker_y=step.get('click_y', 0),
                 text='',  # Текст уже в аудио
                 tts_audio_path=step.get('audio_path', ''),
-                duration_seconds=generator._get_duration(step.get('audio_path', '')) or 3.0,
+                duration_seconds=step.get('duration') or generator._get_duration(step.get('audio_path', '')) or 3.0,
                 annotations=step.get('annotations', []),
                 viewport_width=step.get('screenshot_width'),
                 viewport_height=step.get('screenshot_height'),
@@ -593,6 +613,8 @@ def generate_video_from_steps(
         
         cmd = [
             "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
             "-y",
             "-f", "concat",
             "-safe", "0",
@@ -602,7 +624,13 @@ def generate_video_from_steps(
             str(output_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=300
+        )
         
         if result.returncode == 0 and output_path.exists():
             duration = generator._get_duration(str(output_path))
@@ -12,10 +12,11 @@ Silero TTS Service - бесплатная нейронная озвучка на
 import logging
 import os
 import re
-import tempfile
 import urllib.request
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+
+from app.services import tts_cache
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,8 @@ MODEL_PATH = os.path.join(MODELS_DIR, "v5_5_ru.pt")
 
 DEFAULT_SPEAKER = "xenia"
 SAMPLE_RATE = 48000
+# Сколько длительностей синтезированных файлов помнит сервис
+DURATION_CACHE_SIZE = 1024
 
 
 # --- Препроцессинг текста для естественной русской озвучки ---
@@ -102,6 +105,8 @@ class SileroTTSService:
 
     _instance = None
     _model = None
+    # Длительности синтезированных файлов, посчитанные по числу сэмплов
+    _durations: Dict[str, float] = {}
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -144,6 +149,16 @@ class SileroTTSService:
             voice = DEFAULT_SPEAKER
 
         normalized = normalize_text_for_silero(text)
+
+        # Без явного пути результат кладётся в кэш TTS
+        cache_key = None
+        if not output_path:
+            cache_key = tts_cache.cache_key("silero", voice, SAMPLE_RATE, normalized)
+            cached_path = tts_cache.lookup(cache_key, ".wav")
+            if cached_path:
+                logger.info(f"TTS cache hit: {cached_path}")
+                return cached_path
+
         logger.info(f"Synthesizing (Silero/{voice}): {normalized[:50]}...")
 
         audio = self._model.apply_tts(
@@ -158,24 +173,33 @@ class SileroTTSService:
             save_path = output_path
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
         else:
-            tmp = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            save_path = tmp.name
-            tmp.close()
+            save_path = tts_cache.temp_path(".wav")
 
         # 16-bit PCM — совместимо с wave, pydub и ffmpeg (float-WAV ломает их)
         torchaudio.save(
             save_path, audio.unsqueeze(0), SAMPLE_RATE,
             encoding="PCM_S", bits_per_sample=16,
         )
+        if cache_key:
+            save_path = tts_cache.store(cache_key, ".wav", save_path)
+        self._remember_duration(save_path, audio.shape[-1] / SAMPLE_RATE)
         logger.info(f"Saved audio to {save_path}")
         return save_path
 
+    def _remember_duration(self, audio_path: str, duration: float) -> None:
+        """Запомнить длительность синтезированного файла для get_audio_duration."""
+        if len(self._durations) >= DURATION_CACHE_SIZE:
+            self._durations.pop(next(iter(self._durations)))
+        self._durations[audio_path] = duration
+
     def synthesize_sync(self, text: str, output_path: Optional[str] = None) -> str:
         """Синхронный синтез (для Celery)."""
         return self.synthesize(text=text, output_path=output_path)
 
     def get_audio_duration(self, audio_path: str) -> float:
         """Длительность аудио в секундах."""
+        if audio_path in self._durations:
+            return self._durations[audio_path]
         try:
             import wave
             with wave.open(audio_path, 'rb') as wf:
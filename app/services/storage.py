@@ -4,10 +4,15 @@ Storage Service - локальное файловое хранилище.
 """
 
 import logging
+import mmap
+import os
+import shutil
+import stat
+import time
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, Any, List, BinaryIO
+from typing import Optional, Dict, Any, List, BinaryIO, Tuple
 from enum import Enum
 
 from app.config import settings
@@ -25,6 +30,16 @@ class StorageType(str, Enum):
     AUDIO = "audio"
 
 
+# Алиас для кода, который остался со времён S3/MinIO (workers/ai_runner.py)
+StorageBucket = StorageType
+
+# Сколько секунд переиспользуется результат последней успешной проверки хранилища
+CONNECTION_PROBE_TTL = 2.0
+
+# Файлы больше этого порога копируются через mmap без промежуточных bytes
+MMAP_COPY_THRESHOLD = 4 * 1024 * 1024
+
+
 class StorageError(Exception):
     """Базовый класс для ошибок хранилища."""
     pass
@@ -62,6 +77,27 @@ class StorageService:
         
         for path in [self.screenshots_path, self.videos_path, self.uploads_path, self.wiki_path, self.audio_path]:
             path.mkdir(parents=True, exist_ok=True)
+        
+        self._last_probe: Optional[float] = None
+    
+    def check_connection(self, verbose: bool = False) -> bool:
+        """
+        Проверка доступности хранилища (для /health и probes).
+        
+        По умолчанию - один access() на папку uploads; успешный результат
+        кэшируется на CONNECTION_PROBE_TTL секунд, чтобы пачка probes не
+        дёргала диск. С verbose=True проверяются все папки хранилища.
+        """
+        if not verbose:
+            if self._last_probe is not None and time.monotonic() - self._last_probe < CONNECTION_PROBE_TTL:
+                return True
+            paths = [self.uploads_path]
+        else:
+            paths = [self._get_storage_path(storage_type) for storage_type in StorageType]
+        
+        ok = all(os.access(path, os.R_OK | os.W_OK | os.X_OK) for path in paths)
+        self._last_probe = time.monotonic() if ok else None
+        return ok
     
     def _get_storage_path(self, storage_type: StorageType) -> Path:
         """Получить путь для типа хранилища."""
@@ -74,6 +110,33 @@ class StorageService:
         }
         return paths.get(storage_type, self.uploads_path)
     
+    def _prepare_destination(
+        self,
+        bucket: StorageType,
+        filename: str,
+        guide_id: Optional[int] = None,
+        subfolder: Optional[str] = None,
+    ) -> Tuple[Path, Path, Path]:
+        """Подготовить папку и уникальное имя файла для загрузки."""
+        base_path = self._get_storage_path(bucket)
+        
+        # Создаём подпапку
+        if subfolder:
+            storage_path = base_path / subfolder
+        elif guide_id:
+            storage_path = base_path / str(guide_id)
+        else:
+            storage_path = base_path
+        
+        storage_path.mkdir(parents=True, exist_ok=True)
+        
+        # Генерируем уникальное имя файла
+        unique_id = uuid.uuid4().hex[:8]
+        safe_filename = "".join(c for c in filename if c.isalnum() or c in "._-")
+        final_filename = f"{unique_id}_{safe_filename}"
+        
+        return base_path, storage_path, storage_path / final_filename
+    
     def upload_local_screenshot(
         self,
         file_data: BinaryIO,
@@ -117,24 +180,10 @@ class StorageService:
         subfolder: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Загрузка файла локально."""
-        base_path = self._get_storage_path(bucket)
-        
-        # Создаём подпапку
-        if subfolder:
-            storage_path = base_path / subfolder
-        elif guide_id:
-            storage_path = base_path / str(guide_id)
-        else:
-            storage_path = base_path
-        
-        storage_path.mkdir(parents=True, exist_ok=True)
-        
-        # Генерируем уникальное имя файла
-        unique_id = uuid.uuid4().hex[:8]
-        safe_filename = "".join(c for c in filename if c.isalnum() or c in "._-")
-        final_filename = f"{unique_id}_{safe_filename}"
-        
-        file_path = storage_path / final_filename
+        base_path, storage_path, file_path = self._prepare_destination(
+            bucket, filename, guide_id, subfolder
+        )
+        final_filename = file_path.name
         
         # Сохраняем файл
         file_data.seek(0, 2)
@@ -154,6 +203,104 @@ class StorageService:
             "size_bytes": file_size,
             "content_type": content_type,
         }
+    
+    def upload_local_file(
+        self,
+        file_path: str,
+        bucket: StorageType,
+        content_type: str = "application/octet-stream",
+        guide_id: Optional[int] = None,
+        subfolder: Optional[str] = None,
+        move: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Загрузка файла, уже лежащего на диске (результат рендера, wiki и т.п.).
+        
+        Большие файлы копируются через mmap: ядро отдаёт страницы page cache
+        напрямую в write(), без промежуточного bytes-буфера в Python.
+        С move=True исходник больше не нужен вызывающему: на той же файловой
+        системе файл просто переименовывается, без копирования данных.
+        """
+        source = Path(file_path)
+        if not source.exists():
+            raise FileNotFoundError(f"Source file not found: {file_path}")
+        
+        base_path, storage_path, target_path = self._prepare_destination(
+            bucket, source.name, guide_id, subfolder
+        )
+        
+        try:
+            if move:
+                file_size = self._move_local_file(source, target_path)
+            else:
+                file_size = self._copy_local_file(source, target_path)
+        except OSError as e:
+            raise UploadError(f"Failed to store {file_path}: {e}") from e
+        
+        relative_path = f"/{bucket.value}/{storage_path.relative_to(base_path)}/{target_path.name}"
+        
+        return {
+            "success": True,
+            "local_path": str(target_path),
+            "relative_path": relative_path,
+            "object_key": relative_path,
+            "size_bytes": file_size,
+            "content_type": content_type,
+        }
+    
+    def resolve_path(self, object_key: str) -> Path:
+        """
+        Локальный путь файла по object_key вида /<bucket>/<путь>.
+        
+        Хранилище локальное, поэтому файл можно отдать ffmpeg напрямую,
+        без копирования во временную папку воркера.
+        """
+        bucket_name, _, relative = object_key.lstrip("/").partition("/")
+        try:
+            bucket = StorageType(bucket_name)
+        except ValueError:
+            raise FileNotFoundError(f"Unknown bucket in key: {object_key}")
+        
+        base_path = self._get_storage_path(bucket).resolve()
+        file_path = (base_path / relative).resolve()
+        # Ключ вида /videos/../../etc/passwd не должен выходить за пределы хранилища
+        if not file_path.is_relative_to(base_path) or not file_path.is_file():
+            raise FileNotFoundError(f"File not found: {object_key}")
+        return file_path
+    
+    @classmethod
+    def _move_local_file(cls, source: Path, target: Path) -> int:
+        """Перенести файл: rename в пределах ФС, иначе копия + удаление."""
+        try:
+            os.replace(source, target)
+            return target.stat().st_size
+        except OSError as e:
+            # EXDEV: временная папка воркера на другом томе
+            logger.debug(f"rename {source} -> {target} failed, copying: {e}")
+        
+        file_size = cls._copy_local_file(source, target)
+        source.unlink(missing_ok=True)
+        return file_size
+    
+    @staticmethod
+    def _copy_local_file(source: Path, target: Path) -> int:
+        """Скопировать файл, для больших обычных файлов - через mmap."""
+        st = source.stat()
+        
+        if stat.S_ISREG(st.st_mode) and st.st_size > MMAP_COPY_THRESHOLD:
+            try:
+                with open(source, "rb") as src, open(target, "wb") as dst:
+                    with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        with memoryview(mm) as view:
+                            dst.write(view)
+                return st.st_size
+            except (ValueError, OSError) as e:
+                # Файл не отображается в память (FUSE, спецфайлы) - копируем обычным путём
+                logger.debug(f"mmap copy failed for {source}, falling back: {e}")
+        
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return target.stat().st_size
 
 
 # Экземпляр сервиса для использования в приложении
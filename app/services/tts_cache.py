@@ -0,0 +1,123 @@
+"""
+Дисковый кэш результатов TTS.
+
+Ключ - хэш от (движок, голос, параметры, текст). Одинаковые фразы
+(интро/аутро, повторный рендер гайда) берутся из кэша вместо повторного
+синтеза. Размер ограничен: самые давно использованные файлы удаляются.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = "tts_cache"
+# Сколько файлов держим в кэше (фраза шага - десятки-сотни КБ)
+MAX_CACHE_FILES = 2000
+# Вытеснение запускается раз в столько записей, а не на каждую
+EVICT_EVERY = 50
+
+_writes = 0
+
+
+def cache_key(*parts: object) -> str:
+    """Ключ кэша по параметрам синтеза."""
+    raw = "|".join(str(part) for part in parts)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_cache_dir() -> Path:
+    """Каталог кэша (создаётся при первом обращении)."""
+    cache_dir = settings.WORKER_TEMP_DIR / CACHE_DIR_NAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def is_cached(path: str) -> bool:
+    """Принадлежит ли файл кэшу (такие файлы нельзя удалять после рендера)."""
+    return Path(path).parent == settings.WORKER_TEMP_DIR / CACHE_DIR_NAME
+
+
+def lookup(key: str, suffix: str) -> Optional[str]:
+    """
+    Найти готовый файл в кэше.
+
+    Returns:
+        Путь к файлу или None при промахе
+    """
+    path = get_cache_dir() / f"{key}{suffix}"
+    try:
+        # Явно обновляем atime: на томах с noatime/relatime он сам не меняется
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return str(path)
+
+
+def temp_path(suffix: str) -> str:
+    """
+    Временный файл внутри каталога кэша - чтобы store() переносил его
+    атомарным os.replace без копирования между файловыми системами.
+    """
+    temp_file = tempfile.NamedTemporaryFile(
+        suffix=suffix,
+        dir=get_cache_dir(),
+        delete=False
+    )
+    temp_file.close()
+    return temp_file.name
+
+
+def store(key: str, suffix: str, path: str) -> str:
+    """
+    Положить синтезированный файл в кэш.
+
+    Returns:
+        Путь к файлу в кэше
+    """
+    global _writes
+
+    target = get_cache_dir() / f"{key}{suffix}"
+    os.replace(path, target)
+
+    _writes += 1
+    if _writes % EVICT_EVERY == 0:
+        evict()
+    return str(target)
+
+
+def evict(max_files: int = MAX_CACHE_FILES) -> int:
+    """
+    Удалить самые давно использованные файлы сверх лимита.
+
+    Returns:
+        Количество удалённых файлов
+    """
+    entries = []
+    with os.scandir(get_cache_dir()) as it:
+        for entry in it:
+            try:
+                entries.append((entry.stat().st_atime, entry.path))
+            except FileNotFoundError:
+                continue
+
+    if len(entries) <= max_files:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _, path in entries[:len(entries) - max_files]:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    logger.info(f"TTS cache: evicted {removed} files")
+    return removed
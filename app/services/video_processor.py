@@ -7,25 +7,194 @@ Video Processor Service - основной сервис обработки ви
 """
 
 import asyncio
+import itertools
 import logging
+import math
 import os
+import re
 import subprocess
-import uuid
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from fractions import Fraction
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Callable, Deque, List, Set, Tuple
 from enum import Enum
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson ставится из requirements.txt
+    from json import loads as json_loads
 
 from app.config import settings
 
 
 logger = logging.getLogger(__name__)
 
+# Шрифт подписей в аннотациях
+ANNOTATION_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+# Аппаратные H.264 энкодеры в порядке предпочтения и их параметры качества
+# (эквивалент libx264 -crf 23). VAAPI не используется: ему нужны кадры,
+# загруженные в видеопамять, а фильтры (zoompan, scale) работают на CPU.
+HW_ENCODER_ARGS = {
+    "h264_nvenc": ["-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "0"],
+    "h264_qsv": ["-preset", "medium", "-global_quality", "23"],
+}
+
+# FFmpeg, не сообщавший о прогрессе столько секунд, считается зависшим
+FFMPEG_STALL_TIMEOUT = 60
+# Сколько последних строк stderr FFmpeg сохраняется для лога ошибок
+FFMPEG_STDERR_TAIL_LINES = 200
+
+# Потоков кодирования и фильтров на один процесс FFmpeg (по умолчанию
+# FFmpeg берёт столько, сколько ядер, и параллельные процессы мешают друг другу)
+FFMPEG_THREADS = settings.FFMPEG_THREADS
+# Сколько процессов кодирования FFmpeg работает одновременно
+FFMPEG_MAX_PARALLEL = max(1, (os.cpu_count() or FFMPEG_THREADS) // FFMPEG_THREADS)
+
+# Сколько результатов ffprobe держит кэш get_video_info
+PROBE_CACHE_SIZE = 128
+
+# Сколько кадров extract_frames извлекает одним процессом FFmpeg
+FRAME_BATCH_SIZE = 32
+
+# Сколько секунд ждать один кадр в decode_frame_to_array
+FRAME_DECODE_TIMEOUT = 30
+
+# Частота дискретизации аудио в сегментах (одинаковая у всех для склейки)
+SEGMENT_AUDIO_RATE = 44100
+
+# Сколько клипов apply_time_stretch_batch обрабатывает одним процессом FFmpeg
+STRETCH_BATCH_SIZE = 16
+# Коэффициенты скорости в пределах 1 ± STRETCH_TOLERANCE не растягиваются:
+# разница не слышна, а аудио копируется без перекодирования
+STRETCH_TOLERANCE = 0.01
+
+# Отметки silencedetect в stderr FFmpeg
+SILENCE_MARK_RE = re.compile(r"silence_(start|end):\s*(-?[\d.]+)")
+# Сколько секунд тишины оставляется у границ вырезанного фрагмента,
+# чтобы речь не обрезалась на первом/последнем слоге
+SILENCE_PADDING = 0.1
+
+# До стольких шагов видео собирается одним процессом FFmpeg (по входу на шаг);
+# длинные гайды рендерятся параллельными сегментами с последующей склейкой
+SINGLE_PASS_MAX_STEPS = 40
+# Общий лимит однопроходного рендера: секунд на секунду итогового видео,
+# но не меньше SINGLE_PASS_MIN_TIMEOUT (зависание раньше ловит FFMPEG_STALL_TIMEOUT)
+SINGLE_PASS_TIMEOUT_PER_SECOND = 10
+SINGLE_PASS_MIN_TIMEOUT = 600
+
+# Заголовок ASS-файла субтитров. BorderStyle=3 - подложка-прямоугольник
+# цвета OutlineColour/BackColour под текстом
+ASS_HEADER_TEMPLATE = (
+    "[Script Info]\n"
+    "ScriptType: v4.00+\n"
+    "PlayResX: {w}\n"
+    "PlayResY: {h}\n"
+    "WrapStyle: 0\n"
+    "\n"
+    "[V4+ Styles]\n"
+    "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, "
+    "OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, "
+    "ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+    "MarginL, MarginR, MarginV, Encoding\n"
+    "Style: Default,{font},{size},{primary},{primary},{back},{back},"
+    "0,0,0,0,100,100,0,0,3,4,0,2,20,20,40,1\n"
+    "\n"
+    "[Events]\n"
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
+
+# Шаблон фильтра zoompan для плавного зума: разбирается один раз,
+# на шаг остаётся только подстановка значений. На входе видео, поэтому
+# d=1 - один выходной кадр на входной; fps перед zoompan сначала приводит
+# вход (VFR, 60 fps) к целевой частоте, иначе длительность сегмента меняется
+ZOOM_FILTER_TEMPLATE = (
+    "fps={fps},"
+    "zoompan=z='if(lte(zoom,{zf}),{zf},min(zoom+0.0015,{zf}))':"
+    "x='iw/2-(iw/zoom/2)+({cx}-iw/2)*(zoom-{zf})':"
+    "y='ih/2-(ih/zoom/2)+({cy}-ih/2)*(zoom-{zf})':"
+    "d=1:s={w}x{h}:fps={fps}"
+)
+
+
+@lru_cache(maxsize=64)
+def _parse_color(color: str, mode: str) -> Any:
+    """
+    Цвет аннотации ("#FF0000", "red") в значение для режима изображения.
+    
+    Pillow разбирает строку цвета заново на каждый вызов рисования;
+    аннотации используют несколько одних и тех же цветов.
+    """
+    return ImageColor.getcolor(color, mode)
+
+
+def _ass_color(color: str) -> str:
+    """
+    Цвет в нотации FFmpeg ("white", "#FF0000", "black@0.5") -> ASS &HAABBGGRR.
+    
+    В ASS альфа инвертирована: 00 - непрозрачный, FF - прозрачный.
+    """
+    name, _, opacity = color.partition("@")
+    r, g, b = ImageColor.getrgb(name)[:3]
+    alpha = round((1 - float(opacity or 1)) * 255)
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+
+_temp_counter = itertools.count()
+
+
+def _temp_name(prefix: str, suffix: str = "") -> str:
+    """
+    Уникальное имя временного файла: PID + счётчик процесса.
+    
+    PID берётся при вызове, а не при импорте: воркеры Celery
+    форкаются после импорта модуля.
+    """
+    return f"{prefix}_{os.getpid()}_{next(_temp_counter)}{suffix}"
+
+
+def _escape_filter_path(path: Path) -> str:
+    """
+    Путь для значения опции фильтра FFmpeg.
+    
+    Абсолютный, с прямыми слешами, экранированный для обоих уровней
+    разбора: опций фильтра (\\ ' :) и графа фильтров (\\ ' [ ] , ;).
+    Иначе ':' (диск в Windows) и кавычки в пути ломают разбор.
+    """
+    value = Path(path).resolve().as_posix()
+    for char in "\\':":
+        value = value.replace(char, "\\" + char)
+    for char in "\\'[],;":
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def _atempo_chain(factor: float) -> str:
+    """
+    Цепочка atempo для произвольного коэффициента скорости.
+    
+    Один atempo принимает только 0.5-2.0, поэтому коэффициент
+    раскладывается в произведение: 5.0 -> atempo=2.0,atempo=2.0,atempo=1.25.
+    """
+    filters = []
+    while factor > 2.0:
+        filters.append("atempo=2.0")
+        factor /= 2.0
+    while factor < 0.5:
+        filters.append("atempo=0.5")
+        factor /= 0.5
+    filters.append(f"atempo={factor}")
+    return ",".join(filters)
+
 
 class VideoProcessError(Exception):
     """Базовый класс для ошибок обработки видео."""
@@ -90,6 +259,7 @@ class StepSegment:
     zoom_region: Optional[ZoomRegion] = None
     action_type: Optional[str] = None
     audio_duration: Optional[float] = None
+    zoom_level: float = 1.0
     
     @property
     def duration(self) -> float:
@@ -102,6 +272,58 @@ class StepSegment:
         return self.original_end - self.original_start
 
 
+@dataclass
+class StepArrays:
+    """
+    Числовые поля списка шагов в виде массивов (по массиву на поле).
+    
+    Строится один раз на рендер: коэффициенты растяжения и зума считаются
+    векторно, а цикл по шагам только читает готовые значения по индексу.
+    """
+    start: np.ndarray
+    end: np.ndarray
+    original_start: np.ndarray
+    original_end: np.ndarray
+    zoom: np.ndarray
+    
+    @classmethod
+    def from_list(cls, steps: List[StepSegment]) -> "StepArrays":
+        """Собрать массивы из списка шагов."""
+        fields = np.array(
+            [
+                (
+                    step.start_time,
+                    step.end_time,
+                    step.original_start,
+                    step.original_end,
+                    step.zoom_level if step.zoom_region else 1.0,
+                )
+                for step in steps
+            ],
+            dtype=np.float64
+        ).reshape(-1, 5)
+        return cls(*fields.T)
+    
+    @property
+    def speed_factors(self) -> np.ndarray:
+        """
+        Коэффициенты time-stretching сегментов под новую длительность.
+        
+        Не ограничиваются диапазоном atempo (0.5-2.0): любые значения
+        раскладываются в цепочку фильтров (см. _atempo_chain).
+        Для шагов с нулевой длительностью - 1.0.
+        """
+        duration = self.end - self.start
+        original_duration = self.original_end - self.original_start
+        valid = (duration > 0) & (original_duration > 0)
+        return np.divide(
+            original_duration,
+            duration,
+            out=np.ones_like(duration),
+            where=valid
+        )
+
+
 @dataclass
 class ProcessingProgress:
     """Прогресс обработки видео."""
@@ -125,6 +347,9 @@ class VideoProcessor:
     - Экстракция скриншотов
     """
     
+    # Слоты на процессы кодирования - общие для всех экземпляров
+    _ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_MAX_PARALLEL)
+    
     def __init__(self, ffmpeg_path: str = "ffmpeg", ffprobe_path: str = "ffprobe"):
         """
         Инициализация процессора видео.
@@ -141,17 +366,27 @@ class VideoProcessor:
         self.default_width = settings.VIDEO_OUTPUT_WIDTH
         self.default_height = settings.VIDEO_OUTPUT_HEIGHT
         self.default_fps = settings.VIDEO_FPS
+        # Фильтр приведения к выходному размеру одинаков для всех сегментов
+        self._scale_filter = f"scale={self.default_width}:{self.default_height}"
         
         # Кэш для оптимизации
         self._frame_cache: Dict[str, np.ndarray] = {}
-        self._font_cache: Dict[str, ImageFont.ImageFont] = {}
+        self._font_cache: Dict[int, ImageFont.ImageFont] = {}
+        # Выбранный H.264 энкодер (определяется при первом кодировании)
+        self._video_encoder: Optional[str] = None
+        # Результаты ffprobe по (путь, mtime, размер) - файл не перепроверяется,
+        # пока не изменится
+        self._probe_cache: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+        # Процессор - синглтон, get_video_info зовут из разных потоков
+        self._probe_lock = threading.Lock()
     
     def _check_ffmpeg_installed(self) -> None:
         """Проверка наличия FFmpeg в системе."""
         try:
             subprocess.run(
                 [self.ffmpeg_path, "-version"],
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
                 timeout=10
             )
         except (subprocess.SubprocessError, FileNotFoundError) as e:
@@ -160,6 +395,169 @@ class VideoProcessor:
                 "Please install FFmpeg and add it to PATH."
             )
     
+    def _get_video_encoder(self) -> str:
+        """
+        H.264 энкодер для рендеринга.
+        
+        Наличие энкодера в сборке FFmpeg ещё не значит, что есть железо,
+        поэтому каждый кандидат проверяется кодированием пары тестовых кадров.
+        Результат кэшируется на время жизни процессора.
+        """
+        if self._video_encoder is not None:
+            return self._video_encoder
+        
+        preference = settings.VIDEO_HW_ENCODER
+        if preference == "none":
+            candidates = []
+        elif preference == "auto":
+            candidates = list(HW_ENCODER_ARGS)
+        else:
+            candidates = [preference]
+        
+        self._video_encoder = "libx264"
+        for encoder in candidates:
+            cmd = [
+                self.ffmpeg_path,
+                "-hide_banner",
+                "-f", "lavfi",
+                "-i", "color=size=256x256:rate=30:duration=0.1",
+                "-c:v", encoder,
+                "-f", "null", "-"
+            ]
+            try:
+                result = subprocess.run(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=15
+                )
+            except subprocess.TimeoutExpired:
+                continue
+            if result.returncode == 0:
+                self._video_encoder = encoder
+                break
+        
+        logger.info(f"Using H.264 encoder: {self._video_encoder}")
+        return self._video_encoder
+    
+    def _video_codec_args(self, preset: str = "medium") -> List[str]:
+        """Аргументы видеокодека: аппаратный энкодер или libx264 с заданным preset."""
+        encoder = self._get_video_encoder()
+        if encoder == "libx264":
+            return ["-c:v", "libx264", "-preset", preset, "-crf", "23"]
+        return ["-c:v", encoder] + HW_ENCODER_ARGS.get(encoder, [])
+    
+    def _run_ffmpeg(
+        self,
+        cmd: List[str],
+        timeout: float = 300,
+        expected_duration: Optional[float] = None,
+        progress_callback: Optional[Callable[[float], None]] = None,
+        output_indices: Optional[List[int]] = None,
+        limit_threads: bool = True
+    ) -> subprocess.CompletedProcess:
+        """
+        Запуск FFmpeg с отслеживанием прогресса.
+        
+        FFmpeg пишет ход кодирования в -progress pipe:1; по out_time_us
+        вызывается progress_callback(процент), если известна ожидаемая
+        длительность результата. Процесс, не сообщавший о прогрессе дольше
+        FFMPEG_STALL_TIMEOUT секунд, считается зависшим и убивается сразу,
+        не дожидаясь общего timeout. Одновременно работает не больше
+        FFMPEG_MAX_PARALLEL процессов по FFMPEG_THREADS потоков, остальные
+        ждут свободного слота.
+        
+        Args:
+            output_indices: Индексы выходных файлов в cmd, если выходов
+                несколько (по умолчанию выход один - последний аргумент)
+            limit_threads: Ограничивать потоки FFMPEG_THREADS; False - когда
+                кодирование единственное и может занять все ядра
+        
+        Returns:
+            CompletedProcess с кодом возврата и хвостом stderr
+            
+        Raises:
+            ProcessingTimeoutError: Превышен timeout или процесс завис
+        """
+        # В stderr - только ошибки: хвоста хватает для диагностики, а
+        # баннер и служебный вывод не гоняются через pipe.
+        # Потоки фильтров - глобальные опции, потоки энкодеров - опция
+        # каждого выходного файла, поэтому -threads ставится перед каждым
+        threads = str(FFMPEG_THREADS)
+        outputs = set(output_indices) if output_indices else {len(cmd) - 1}
+        args: List[str] = []
+        for i, arg in enumerate(cmd[1:], start=1):
+            if limit_threads and i in outputs:
+                args.extend(["-threads", threads])
+            args.append(arg)
+        thread_args = (
+            ["-filter_threads", threads, "-filter_complex_threads", threads]
+            if limit_threads else []
+        )
+        cmd = [
+            cmd[0], "-hide_banner", "-loglevel", "error",
+            "-progress", "pipe:1", "-nostats",
+            *thread_args,
+            *args
+        ]
+        # Ожидание слота не входит в timeout: отсчёт начинается с запуска
+        with self._ffmpeg_slots:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace"
+            )
+        
+            stderr_tail: Deque[str] = deque(maxlen=FFMPEG_STDERR_TAIL_LINES)
+            last_progress = time.monotonic()
+        
+            def read_progress() -> None:
+                nonlocal last_progress
+                for line in proc.stdout:
+                    last_progress = time.monotonic()
+                    if not (progress_callback and expected_duration):
+                        continue
+                    key, _, value = line.strip().partition("=")
+                    if key == "out_time_us" and value.isdigit():
+                        percent = int(value) / 1e6 / expected_duration * 100
+                        progress_callback(min(100.0, percent))
+        
+            def read_stderr() -> None:
+                for line in proc.stderr:
+                    stderr_tail.append(line)
+        
+            readers = [
+                threading.Thread(target=read_progress, daemon=True),
+                threading.Thread(target=read_stderr, daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+        
+            started = time.monotonic()
+            while True:
+                try:
+                    proc.wait(timeout=1)
+                    break
+                except subprocess.TimeoutExpired:
+                    now = time.monotonic()
+                    if now - started > timeout:
+                        reason = f"timed out after {timeout}s"
+                    elif now - last_progress > FFMPEG_STALL_TIMEOUT:
+                        reason = f"stalled for {FFMPEG_STALL_TIMEOUT}s"
+                    else:
+                        continue
+                    proc.kill()
+                    proc.wait()
+                    raise ProcessingTimeoutError(f"FFmpeg {reason}")
+        
+            for reader in readers:
+                reader.join()
+        
+            return subprocess.CompletedProcess(cmd, proc.returncode, None, "".join(stderr_tail))
+    
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
         """
         Получение информации о видеофайле.
@@ -170,6 +568,25 @@ class VideoProcessor:
         Returns:
             Словарь с информацией о видео
         """
+        st = os.stat(video_path)
+        cache_key = (video_path, st.st_mtime_ns, st.st_size)
+        
+        with self._probe_lock:
+            info = self._probe_cache.get(cache_key)
+            if info is not None:
+                self._probe_cache.move_to_end(cache_key)
+                return info
+        
+        # ffprobe - вне блокировки, чтобы не сериализовать разные файлы
+        info = self._probe_video(video_path)
+        with self._probe_lock:
+            self._probe_cache[cache_key] = info
+            if len(self._probe_cache) > PROBE_CACHE_SIZE:
+                self._probe_cache.popitem(last=False)
+        return info
+    
+    def _probe_video(self, video_path: str) -> Dict[str, Any]:
+        """Запуск ffprobe и разбор его JSON-вывода."""
         cmd = [
             self.ffprobe_path,
             "-v", "quiet",
@@ -179,13 +596,14 @@ class VideoProcessor:
             video_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        # Байты без декодирования: json_loads разбирает их напрямую
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
         
         if result.returncode != 0:
-            raise VideoProcessError(f"Failed to probe video: {result.stderr}")
+            stderr = result.stderr.decode(errors="replace")
+            raise VideoProcessError(f"Failed to probe video: {stderr}")
         
-        import json
-        data = json.loads(result.stdout)
+        data = json_loads(result.stdout)
         
         # Поиск видео и аудио потоков
         video_stream = None
@@ -253,36 +671,73 @@ class VideoProcessor:
             output_dir: Директория для сохранения кадров
             
         Returns:
-            Список путей к извлеченным кадрам
+            Список путей к извлеченным кадрам (кадры, которые не удалось
+            извлечь, пропускаются и пишутся в лог)
         """
         if output_dir is None:
-            output_dir = Path(settings.TEMP_DIR) / "frames"
+            output_dir = Path(settings.WORKER_TEMP_DIR) / "frames"
         Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        output_paths = []
-        
-        for i, ts in enumerate(timestamps):
-            output_path = Path(output_dir) / f"frame_{i:06d}_{ts:.3f}.jpg"
-            output_paths.append(str(output_path))
+        output_paths = [
+            str(Path(output_dir) / f"frame_{i:06d}_{ts:.3f}.jpg")
+            for i, ts in enumerate(timestamps)
+        ]
+        scale_filter = f"scale={width}:{height}:force_original_aspect_ratio=decrease"
+        
+        # Один процесс на пачку кадров: у каждого кадра свой вход с быстрым
+        # seek (-ss до -i), а запуск FFmpeg и инициализация демуксера не
+        # повторяются на каждый кадр. Для превью точность до кадра не нужна:
+        # -noaccurate_seek берёт ближайший ключевой кадр и не декодирует
+        # всё от него до метки
+        for start in range(0, len(timestamps), FRAME_BATCH_SIZE):
+            batch = range(start, min(start + FRAME_BATCH_SIZE, len(timestamps)))
             
-            cmd = [
-                self.ffmpeg_path,
-                "-ss", str(ts),
-                "-i", video_path,
-                "-vframes", "1",
-                "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease",
-                "-q:v", "2",
-                "-y",  # Перезаписать существующие файлы
-                str(output_path)
-            ]
+            cmd = [self.ffmpeg_path, "-y"]  # Перезаписать существующие файлы
+            for i in batch:
+                cmd.extend(["-ss", str(timestamps[i]), "-noaccurate_seek", "-i", video_path])
+            for input_index, i in enumerate(batch):
+                cmd.extend([
+                    "-map", f"{input_index}:v:0",
+                    "-frames:v", "1",
+                    "-vf", scale_filter,
+                    "-q:v", "2",
+                    output_paths[i]
+                ])
             
             try:
-                subprocess.run(cmd, capture_output=True, timeout=30)
+                result = subprocess.run(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    errors="replace",
+                    timeout=30 + 2 * len(batch)
+                )
             except subprocess.TimeoutExpired:
-                logger.warning(f"Timeout extracting frame at {ts}s")
+                logger.warning(
+                    f"Timeout extracting frames {timestamps[batch[0]]}s-{timestamps[batch[-1]]}s"
+                )
                 continue
+            
+            if result.returncode != 0:
+                logger.warning(
+                    f"FFmpeg failed extracting frames {timestamps[batch[0]]}s-"
+                    f"{timestamps[batch[-1]]}s: {result.stderr[-2000:]}"
+                )
+        
+        # Часть кадров пачки может не записаться (метка за концом видео,
+        # ошибка или таймаут) - возвращаем только существующие файлы
+        extracted = []
+        missing = []
+        for ts, path in zip(timestamps, output_paths):
+            if os.path.exists(path):
+                extracted.append(path)
+            else:
+                missing.append(ts)
+        if missing:
+            logger.warning(f"Frames not extracted at {missing}")
         
-        return output_paths
+        return extracted
     
     def extract_screenshot(
         self,
@@ -328,12 +783,94 @@ class VideoProcessor:
         ])
         
         try:
-            subprocess.run(cmd, capture_output=True, timeout=30)
+            subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=30
+            )
             return Path(output_path).exists()
         except subprocess.TimeoutExpired:
             logger.error(f"Timeout extracting screenshot at {timestamp}s")
             return False
     
+    def decode_frame_to_array(
+        self,
+        video_path: str,
+        timestamp: float,
+        width: Optional[int] = None,
+        height: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Декодирование одного кадра сразу в массив пикселей.
+        
+        Кадр идёт из FFmpeg через pipe в виде сырого RGB - без кодирования
+        в JPEG, записи на диск и повторного декодирования.
+        
+        Args:
+            video_path: Путь к видеофайлу
+            timestamp: Временная метка кадра
+            width: Желаемая ширина (None - оригинальная)
+            height: Желаемая высота (None - оригинальная)
+            
+        Returns:
+            Массив (height, width, 3) uint8 (записываемый) или None при ошибке
+        """
+        if not (width and height):
+            video = self.get_video_info(video_path)["video"]
+            width, height = video["width"], video["height"]
+        
+        cmd = [
+            self.ffmpeg_path,
+            "-noautorotate",  # Размеры кадра должны совпадать с ffprobe
+            "-ss", str(timestamp),
+            "-i", video_path,
+            "-frames:v", "1",
+            "-vf", f"scale={width}:{height}",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-"
+        ]
+        
+        # Кадр читается прямо в заранее выделенный (и записываемый) массив,
+        # без промежуточного bytes
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        buffer = memoryview(frame).cast("B")
+        filled = 0
+        
+        timed_out = threading.Event()
+        with subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        ) as proc:
+            def kill() -> None:
+                timed_out.set()
+                proc.kill()
+            
+            # У readinto нет timeout - зависший FFmpeg убивает таймер
+            timer = threading.Timer(FRAME_DECODE_TIMEOUT, kill)
+            timer.start()
+            try:
+                while filled < len(buffer):
+                    n = proc.stdout.readinto(buffer[filled:])
+                    if not n:
+                        break
+                    filled += n
+                returncode = proc.wait()
+            finally:
+                timer.cancel()
+        
+        if timed_out.is_set():
+            logger.error(f"Timeout decoding frame at {timestamp}s")
+            return None
+        if returncode != 0 or filled < len(buffer):
+            logger.error(f"Failed to decode frame at {timestamp}s")
+            return None
+        
+        return frame
+    
     def add_annotations_to_image(
         self,
         image_path: str,
@@ -357,7 +894,7 @@ class VideoProcessor:
             
             for ann in annotations:
                 ann_type = ann.get("type", "rect")
-                color = ann.get("color", "#FF0000")
+                color = _parse_color(ann.get("color", "#FF0000"), img.mode)
                 x = ann.get("x", 0)
                 y = ann.get("y", 0)
                 
@@ -375,7 +912,7 @@ class VideoProcessor:
                 elif ann_type == "text":
                     text = ann.get("text", "")
                     font_size = ann.get("font_size", 24)
-                    text_color = ann.get("text_color", "#FFFFFF")
+                    text_color = _parse_color(ann.get("text_color", "#FFFFFF"), img.mode)
                     self._draw_text_with_background(
                         draw, text, x, y, font_size, color, text_color
                     )
@@ -399,23 +936,34 @@ class VideoProcessor:
         draw: ImageDraw.ImageDraw,
         x1: int, y1: int,
         x2: int, y2: int,
-        color: str
+        color: Any
     ) -> None:
         """Рисование стрелки на изображении."""
         draw.line([(x1, y1), (x2, y2)], fill=color, width=3)
         
-        # Рисуем наконечник
-        angle = np.arctan2(y2 - y1, x2 - x1)
+        # Наконечник - закрашенный треугольник. Скалярная тригонометрия
+        # через math: ufunc-и numpy на одиночных числах в разы медленнее
+        angle = math.atan2(y2 - y1, x2 - x1)
         arrow_length = 15
-        arrow_angle = np.pi / 6
+        arrow_angle = math.pi / 6
         
-        x3 = x2 - arrow_length * np.cos(angle - arrow_angle)
-        y3 = y2 - arrow_length * np.sin(angle - arrow_angle)
-        x4 = x2 - arrow_length * np.cos(angle + arrow_angle)
-        y4 = y2 - arrow_length * np.sin(angle + arrow_angle)
+        x3 = x2 - arrow_length * math.cos(angle - arrow_angle)
+        y3 = y2 - arrow_length * math.sin(angle - arrow_angle)
+        x4 = x2 - arrow_length * math.cos(angle + arrow_angle)
+        y4 = y2 - arrow_length * math.sin(angle + arrow_angle)
         
-        draw.line([(x2, y2), (x3, y3)], fill=color, width=3)
-        draw.line([(x2, y2), (x4, y4)], fill=color, width=3)
+        draw.polygon([(x2, y2), (x3, y3), (x4, y4)], fill=color)
+    
+    def _get_font(self, font_size: int) -> ImageFont.ImageFont:
+        """Шрифт нужного размера; TTF разбирается один раз на размер."""
+        font = self._font_cache.get(font_size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(ANNOTATION_FONT_PATH, font_size)
+            except OSError:
+                font = ImageFont.load_default()
+            self._font_cache[font_size] = font
+        return font
     
     def _draw_text_with_background(
         self,
@@ -424,14 +972,11 @@ class VideoProcessor:
         x: int,
         y: int,
         font_size: int,
-        bg_color: str,
-        text_color: str
+        bg_color: Any,
+        text_color: Any
     ) -> None:
         """Рисование текста с фоном."""
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
+        font = self._get_font(font_size)
         
         bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
@@ -479,37 +1024,67 @@ class VideoProcessor:
         original_height = video_info["video"]["height"]
         duration = video_info["duration"]
         
+        # Наличие файлов озвучки проверяем один раз на весь гайд
+        audio_files = self._existing_audio_files(steps)
+        arrays = StepArrays.from_list(steps)
+        
+        # Небольшие гайды рендерим одним процессом: один проход кодирования
+        # вместо N процессов и склейки
+        if len(steps) <= SINGLE_PASS_MAX_STEPS:
+            if progress_callback:
+                progress_callback(ProcessingProgress(
+                    current_step=0,
+                    total_steps=len(steps),
+                    progress_percent=0,
+                    message=f"Rendering {len(steps)} steps in a single pass",
+                    stage="rendering"
+                ))
+            
+            if not self._render_single_pass(
+                input_video,
+                output_video,
+                steps,
+                original_width,
+                original_height,
+                "audio" in video_info,
+                arrays,
+                audio_files,
+                progress_callback
+            ):
+                return False
+            
+            if progress_callback:
+                progress_callback(ProcessingProgress(
+                    current_step=100,
+                    total_steps=100,
+                    progress_percent=100,
+                    message="Complete",
+                    stage="complete"
+                ))
+            return True
+        
         # Создаем временную директорию
-        temp_dir = Path(settings.TEMP_DIR) / f"render_{uuid.uuid4().hex[:8]}"
+        temp_dir = Path(settings.WORKER_TEMP_DIR) / _temp_name("render")
         temp_dir.mkdir(parents=True, exist_ok=True)
         
         try:
-            # Обрабатываем каждый сегмент
-            segment_files = []
+            # Имена сегментов фиксированы заранее - порядок склейки не зависит
+            # от того, в каком порядке закончится рендеринг
+            segment_files = [
+                str(temp_dir / f"segment_{i:04d}.mp4") for i in range(len(steps))
+            ]
             
-            for i, step in enumerate(steps):
-                if progress_callback:
-                    progress_callback(ProcessingProgress(
-                        current_step=i + 1,
-                        total_steps=len(steps),
-                        progress_percent=((i + 1) / len(steps)) * 100,
-                        message=f"Processing step {i + 1}/{len(steps)}",
-                        stage="rendering"
-                    ))
-                
-                # Извлекаем сегмент видео
-                segment_file = temp_dir / f"segment_{i:04d}.mp4"
-                segment_files.append(str(segment_file))
-                
-                if not self._extract_and_zoom_segment(
-                    input_video,
-                    str(segment_file),
-                    step,
-                    original_width,
-                    original_height
-                ):
-                    logger.error(f"Failed to process segment {i}")
-                    return False
+            if not self._render_segments(
+                input_video,
+                segment_files,
+                steps,
+                original_width,
+                original_height,
+                arrays,
+                audio_files,
+                progress_callback
+            ):
+                return False
             
             # Объединяем сегменты
             if progress_callback:
@@ -545,71 +1120,243 @@ class VideoProcessor:
             if temp_dir.exists():
                 shutil.rmtree(temp_dir, ignore_errors=True)
     
-    def _extract_and_zoom_segment(
+    @staticmethod
+    def _existing_audio_files(steps: List[StepSegment]) -> Set[str]:
+        """
+        Файлы озвучки шагов, которые реально существуют.
+        
+        Один stat на уникальный путь вместо проверки в каждом сегменте.
+        """
+        paths = {step.audio_path for step in steps if step.audio_path}
+        return {path for path in paths if os.path.isfile(path)}
+    
+    def _render_single_pass(
         self,
         input_video: str,
         output_video: str,
-        step: StepSegment,
+        steps: List[StepSegment],
         original_width: int,
-        original_height: int
+        original_height: int,
+        has_audio: bool,
+        arrays: StepArrays,
+        audio_files: Set[str],
+        progress_callback: Optional[callable] = None
     ) -> bool:
         """
-        Извлечение сегмента с применением зума.
+        Рендеринг всех шагов одним процессом FFmpeg.
         
-        Ключевой момент: Time-stretching видео под новую длину аудио.
+        Каждый шаг - отдельный вход с быстрым seek (-ss/-t до -i), поэтому
+        исходник читается только в нужных интервалах и ничего не буферизуется;
+        фильтры шагов сходятся в concat, и кодирование выполняется один раз -
+        без N инициализаций libx264 и без промежуточных файлов и склейки.
+        """
+        cmd = [self.ffmpeg_path]
+        chains = []
+        concat_inputs = []
+        input_count = 0
+        speed_factors = arrays.speed_factors.tolist()
+        zoom_factors = arrays.zoom.tolist()
+        
+        for i, step in enumerate(steps):
+            video_input = input_count
+            input_count += 1
+            cmd.extend([
+                "-ss", str(step.original_start),
+                "-t", str(step.original_duration),
+                "-i", input_video,
+            ])
+            
+            vf_string = self._segment_video_filter(
+                step, zoom_factors[i], original_width, original_height
+            )
+            speed_factor = speed_factors[i]
+            atempo = _atempo_chain(speed_factor)
+            chains.append(
+                f"[{video_input}:v]{vf_string},setpts=(PTS-STARTPTS)/{speed_factor},setsar=1[v{i}]"
+            )
+            
+            if step.audio_path in audio_files:
+                audio_input = input_count
+                input_count += 1
+                cmd.extend(["-i", step.audio_path])
+                chains.append(f"[{audio_input}:a]{atempo},asetpts=PTS-STARTPTS[a{i}]")
+            elif has_audio:
+                chains.append(f"[{video_input}:a]{atempo},asetpts=PTS-STARTPTS[a{i}]")
+            else:
+                # concat требует аудио у каждого сегмента - подставляем тишину
+                chains.append(
+                    f"anullsrc=r={SEGMENT_AUDIO_RATE}:cl=stereo,atrim=0:{step.duration}[a{i}]"
+                )
+            
+            concat_inputs.append(f"[v{i}][a{i}]")
+        
+        chains.append(f"{''.join(concat_inputs)}concat=n={len(steps)}:v=1:a=1[vout][aout]")
+        
+        cmd.extend([
+            "-filter_complex", ";".join(chains),
+            "-map", "[vout]",
+            "-map", "[aout]",
+            *self._video_codec_args(),
+            "-r", str(self.default_fps),
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
+            "-y",
+            output_video
+        ])
+        
+        def report(percent: float) -> None:
+            progress_callback(ProcessingProgress(
+                current_step=0,
+                total_steps=len(steps),
+                progress_percent=percent,
+                message=f"Rendering {len(steps)} steps in a single pass",
+                stage="rendering"
+            ))
+        
+        # Длинная запись кодируется дольше: лимит растёт с длительностью,
+        # а единственный процесс рендера получает все ядра
+        output_duration = sum(step.duration for step in steps)
+        try:
+            result = self._run_ffmpeg(
+                cmd,
+                timeout=max(
+                    SINGLE_PASS_MIN_TIMEOUT,
+                    output_duration * SINGLE_PASS_TIMEOUT_PER_SECOND
+                ),
+                expected_duration=output_duration,
+                progress_callback=report if progress_callback else None,
+                limit_threads=False
+            )
+            
+            if result.returncode != 0:
+                logger.error(f"FFmpeg single-pass error: {result.stderr[-2000:]}")
+                return False
+            
+            # Код возврата 0 уже означает, что файл записан
+            return True
+            
+        except ProcessingTimeoutError:
+            logger.error("Timeout rendering video in single pass")
+            return False
+    
+    def _render_segments(
+        self,
+        input_video: str,
+        segment_files: List[str],
+        steps: List[StepSegment],
+        original_width: int,
+        original_height: int,
+        arrays: StepArrays,
+        audio_files: Set[str],
+        progress_callback: Optional[callable] = None
+    ) -> bool:
         """
-        # Вычисляем параметры зума
-        zoom_factor = step.zoom_level if step.zoom_region else 1.0
+        Параллельный рендеринг сегментов.
         
+        Каждый сегмент - независимый процесс FFmpeg, поэтому они запускаются
+        одновременно из пула потоков (ожидание процесса отпускает GIL).
+        При первой ошибке оставшиеся в очереди сегменты отменяются.
+        """
+        workers = max(1, min(len(steps), FFMPEG_MAX_PARALLEL))
+        done = 0
+        speed_factors = arrays.speed_factors.tolist()
+        zoom_factors = arrays.zoom.tolist()
+        
+        # Энкодер определяем до запуска пула, а не наперегонки из потоков
+        self._get_video_encoder()
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    self._extract_and_zoom_segment,
+                    input_video,
+                    segment_files[i],
+                    step,
+                    original_width,
+                    original_height,
+                    speed_factors[i],
+                    zoom_factors[i],
+                    audio_files
+                ): i
+                for i, step in enumerate(steps)
+            }
+            
+            for future in as_completed(futures):
+                i = futures[future]
+                if not future.result():
+                    logger.error(f"Failed to process segment {i}")
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    return False
+                
+                done += 1
+                if progress_callback:
+                    progress_callback(ProcessingProgress(
+                        current_step=done,
+                        total_steps=len(steps),
+                        progress_percent=(done / len(steps)) * 100,
+                        message=f"Processed step {done}/{len(steps)}",
+                        stage="rendering"
+                    ))
+        
+        return True
+    
+    def _segment_video_filter(
+        self,
+        step: StepSegment,
+        zoom_factor: float,
+        original_width: int,
+        original_height: int
+    ) -> str:
+        """Цепочка видеофильтров сегмента: зум на область клика и масштаб."""
         # Фильтры видео
         video_filters = []
         
         # Применяем зум если нужно
         if step.zoom_region and zoom_factor > 1.0:
             zr = step.zoom_region
-            
-            # Вычисляем область для зума
-            new_width = int(original_width / zoom_factor)
-            new_height = int(original_height / zoom_factor)
-            
-            # Центрируем область
-            new_x = max(0, min(zr.center_x - new_width // 2, original_width - new_width))
-            new_y = max(0, min(zr.center_y - new_height // 2, original_height - new_height))
-            
-            # Фильтр zoompan для плавного зума
-            # format=yuv420p, scale для совместимости
-            zoom_filter = (
-                f"zoompan=z='if(lte(zoom,{zoom_factor}),{zoom_factor},"
-                f"min(zoom+0.0015,{zoom_factor}))':"
-                f"x='iw/2-(iw/zoom/2)+({zr.center_x}-iw/2)*(zoom-{zoom_factor})':"
-                f"y='ih/2-(ih/zoom/2)+({zr.center_y}-ih/2)*(zoom-{zoom_factor})':"
-                f"d={int(step.duration * 30)}:"  # Длительность в кадрах
-                f"s={original_width}x{original_height}:"
-                f"fps=30"
-            )
-            video_filters.append(zoom_filter)
+            video_filters.append(ZOOM_FILTER_TEMPLATE.format_map({
+                "zf": zoom_factor,
+                "cx": zr.center_x,
+                "cy": zr.center_y,
+                "w": original_width,
+                "h": original_height,
+                "fps": self.default_fps,
+            }))
         
         # Добавляем масштабирование если нужно
         if self.default_width != original_width or self.default_height != original_height:
-            scale_filter = f"scale={self.default_width}:{self.default_height}"
-            video_filters.append(scale_filter)
+            video_filters.append(self._scale_filter)
         
         # Добавляем наложение курсора (опционально)
         # video_filters.append("hwupload")  # Для аппаратного ускорения
         
-        vf_string = ",".join(video_filters) if video_filters else "null"
+        return ",".join(video_filters) if video_filters else "null"
+    
+    def _extract_and_zoom_segment(
+        self,
+        input_video: str,
+        output_video: str,
+        step: StepSegment,
+        original_width: int,
+        original_height: int,
+        speed_factor: float,
+        zoom_factor: float,
+        audio_files: Set[str]
+    ) -> bool:
+        """
+        Извлечение сегмента с применением зума.
         
-        # Вычисляем speed factor для time-stretching
+        Ключевой момент: Time-stretching видео под новую длину аудио.
+        """
+        vf_string = self._segment_video_filter(
+            step, zoom_factor, original_width, original_height
+        )
         original_duration = step.original_duration
-        new_duration = step.duration
         
-        if original_duration > 0:
-            speed_factor = original_duration / new_duration
-        else:
-            speed_factor = 1.0
-        
-        # Ограничиваем speed_factor для стабильности
-        speed_factor = max(0.5, min(2.0, speed_factor))
+        # Видео растягивается так же, как аудио, чтобы длины совпали
+        stretched_vf = f"{vf_string},setpts=PTS/{speed_factor}"
+        atempo = _atempo_chain(speed_factor)
         
         # Команда FFmpeg
         cmd = [
@@ -620,10 +1367,10 @@ class VideoProcessor:
         ]
         
         # Добавляем аудио если есть
-        if step.audio_path and Path(step.audio_path).exists():
+        if step.audio_path in audio_files:
             cmd.extend([
                 "-i", step.audio_path,
-                "-filter_complex", f"[0:v]{vf_string}[v];[1:a]atempo={speed_factor}[a]",
+                "-filter_complex", f"[0:v]{stretched_vf}[v];[1:a]{atempo}[a]",
                 "-map", "[v]",
                 "-map", "[a]",
             ])
@@ -631,7 +1378,7 @@ class VideoProcessor:
             # Без аудио или с оригинальной аудио и time-stretching
             if speed_factor != 1.0:
                 cmd.extend([
-                    "-filter_complex", f"[0:v]{vf_string}[v];[0:a]atempo={speed_factor}[a]",
+                    "-filter_complex", f"[0:v]{stretched_vf}[v];[0:a]{atempo}[a]",
                     "-map", "[v]",
                     "-map", "[a]",
                 ])
@@ -640,12 +1387,19 @@ class VideoProcessor:
                     "-vf", vf_string,
                 ])
         
+        # Сегменты склеиваются через -c copy и по сути являются финальным
+        # кодированием, поэтому preset не понижаем. Зато выравниваем параметры
+        # потоков: TTS-аудио (24/48 кГц, моно) и дорожка записи иначе расходятся,
+        # copy-склейка ломается и срабатывает медленный _reencode_concat.
+        # Постоянная частота кадров - по той же причине
         cmd.extend([
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", "23",
+            *self._video_codec_args(),
+            "-r", str(self.default_fps),
+            "-pix_fmt", "yuv420p",
             "-c:a", "aac",
             "-b:a", "128k",
+            "-ar", str(SEGMENT_AUDIO_RATE),
+            "-ac", "2",
             "-y",
             output_video
         ])
@@ -653,20 +1407,15 @@ class VideoProcessor:
         logger.debug(f"FFmpeg command: {' '.join(cmd[:10])}...")
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 минут максимум
-            )
+            result = self._run_ffmpeg(cmd, timeout=300)  # 5 минут максимум
             
             if result.returncode != 0:
                 logger.error(f"FFmpeg error: {result.stderr}")
                 return False
             
-            return Path(output_video).exists()
+            return True
             
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             logger.error(f"Timeout processing segment")
             return False
     
@@ -681,9 +1430,9 @@ class VideoProcessor:
         ]
         
         try:
-            subprocess.run(cmd, capture_output=True, timeout=60)
+            self._run_ffmpeg(cmd, timeout=60)
             return Path(output_video).exists()
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             return False
     
     def _create_concat_list(self, output_file: Path, files: List[str]) -> None:
@@ -705,7 +1454,7 @@ class VideoProcessor:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=120)
+            result = self._run_ffmpeg(cmd, timeout=120)
             
             if result.returncode != 0:
                 logger.error(f"Concatenation error: {result.stderr}")
@@ -714,7 +1463,7 @@ class VideoProcessor:
             
             return Path(output_video).exists()
             
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             return False
     
     def _reencode_concat(self, concat_file: str, output_video: str) -> bool:
@@ -724,9 +1473,7 @@ class VideoProcessor:
             "-f", "concat",
             "-safe", "0",
             "-i", concat_file,
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
+            *self._video_codec_args(preset="fast"),
             "-c:a", "aac",
             "-b:a", "128k",
             "-y",
@@ -734,9 +1481,9 @@ class VideoProcessor:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            result = self._run_ffmpeg(cmd, timeout=300)
             return result.returncode == 0 and Path(output_video).exists()
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             return False
     
     def generate_shorts(
@@ -788,17 +1535,29 @@ class VideoProcessor:
                 f"(ow-iw)/2:(oh-ih)/2"
             ),
             "-r", str(params["fps"]),
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
+            *self._video_codec_args(preset="fast"),
             "-c:a", "aac",
             "-b:a", "128k",
             "-y",
             output_video
         ]
         
+        def report(percent: float) -> None:
+            progress_callback(ProcessingProgress(
+                current_step=2,
+                total_steps=3,
+                progress_percent=10 + percent * 0.9,
+                message="Encoding vertical video",
+                stage="encoding"
+            ))
+        
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            result = self._run_ffmpeg(
+                cmd,
+                timeout=300,
+                expected_duration=self.get_video_info(input_video)["duration"],
+                progress_callback=report if progress_callback else None
+            )
             
             if result.returncode != 0:
                 logger.error(f"Shorts generation error: {result.stderr}")
@@ -815,7 +1574,7 @@ class VideoProcessor:
             
             return Path(output_video).exists()
             
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             logger.error("Shorts generation timeout")
             return False
     
@@ -846,24 +1605,52 @@ class VideoProcessor:
                 stage="analysis"
             ))
         
-        # Используем silenceremove фильтр
+        video_info = self.get_video_info(input_video)
+        if "audio" not in video_info:
+            return self._copy_video(input_video, output_video)
+        
+        duration = video_info["duration"]
+        silences = self._detect_silence(input_video, silence_threshold, min_silence_duration)
+        if silences is None:
+            return False
+        
+        keep = self._keep_intervals(silences, duration)
+        if not keep or keep == [(0.0, duration)]:
+            # Вырезать нечего - кодирование не нужно
+            return self._copy_video(input_video, output_video)
+        
+        if progress_callback:
+            progress_callback(ProcessingProgress(
+                current_step=2,
+                total_steps=2,
+                progress_percent=50,
+                message=f"Removing {len(silences)} silent intervals",
+                stage="encoding"
+            ))
+        
+        # Видео и аудио режутся по одним и тем же интервалам и заново
+        # нумеруются по времени - синхронность сохраняется (при вырезании
+        # только из аудио с -c:v copy дорожки расходились)
+        ranges = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in keep)
         cmd = [
             self.ffmpeg_path,
             "-i", input_video,
-            "-af", (
-                f"silenceremove=start_threshold={silence_threshold}:"
-                f"stop_threshold={silence_threshold}:"
-                f"start_duration={min_silence_duration}:"
-                f"stop_duration=0.1"
+            "-filter_complex", (
+                f"[0:v]select='{ranges}',setpts=N/FRAME_RATE/TB[v];"
+                f"[0:a]aselect='{ranges}',asetpts=N/SR/TB[a]"
             ),
-            "-c:v", "copy",
+            "-map", "[v]",
+            "-map", "[a]",
+            *self._video_codec_args(),
             "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
             "-y",
             output_video
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            result = self._run_ffmpeg(cmd, timeout=300)
             
             if progress_callback:
                 progress_callback(ProcessingProgress(
@@ -876,9 +1663,83 @@ class VideoProcessor:
             
             return result.returncode == 0 and Path(output_video).exists()
             
-        except subprocess.TimeoutExpired:
+        except ProcessingTimeoutError:
             return False
     
+    def _detect_silence(
+        self,
+        input_video: str,
+        silence_threshold: float,
+        min_silence_duration: float
+    ) -> Optional[List[Tuple[float, float]]]:
+        """
+        Поиск интервалов тишины фильтром silencedetect.
+        
+        Декодируется только аудио (-vn), поэтому проход быстрый.
+        
+        Returns:
+            Список (начало, конец) или None при ошибке FFmpeg
+        """
+        cmd = [
+            self.ffmpeg_path,
+            "-hide_banner",
+            "-nostats",
+            "-i", input_video,
+            "-vn",
+            "-af", f"silencedetect=noise={silence_threshold}dB:d={min_silence_duration}",
+            "-f", "null",
+            "-"
+        ]
+        
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        except subprocess.TimeoutExpired:
+            logger.error("Timeout detecting silence")
+            return None
+        
+        if result.returncode != 0:
+            logger.error(f"FFmpeg silencedetect error: {result.stderr[-2000:]}")
+            return None
+        
+        silences = []
+        start = None
+        for kind, value in SILENCE_MARK_RE.findall(result.stderr):
+            if kind == "start":
+                start = max(0.0, float(value))
+            elif start is not None:
+                silences.append((start, float(value)))
+                start = None
+        
+        # Тишина до конца файла: silence_end не печатается
+        if start is not None:
+            silences.append((start, float("inf")))
+        
+        return silences
+    
+    @staticmethod
+    def _keep_intervals(
+        silences: List[Tuple[float, float]],
+        duration: float
+    ) -> List[Tuple[float, float]]:
+        """Интервалы со звуком - дополнение к тишине с отступом SILENCE_PADDING."""
+        keep: List[Tuple[float, float]] = []
+        
+        def add(start: float, end: float) -> None:
+            # Короткие паузы (меньше двух отступов) дают перекрытие - сливаем
+            if keep and start <= keep[-1][1]:
+                keep[-1] = (keep[-1][0], max(keep[-1][1], end))
+            elif end > start:
+                keep.append((start, end))
+        
+        position = 0.0
+        for start, end in silences:
+            if start > position:
+                add(position, min(start + SILENCE_PADDING, duration))
+            position = max(position, end - SILENCE_PADDING)
+        if position < duration:
+            add(position, duration)
+        return keep
+    
     def add_music_overlay(
         self,
         input_video: str,
@@ -920,9 +1781,9 @@ class VideoProcessor:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
-            return result.returncode == 0 and Path(output_video).exists()
-        except subprocess.TimeoutExpired:
+            result = self._run_ffmpeg(cmd, timeout=300)
+            return result.returncode == 0
+        except ProcessingTimeoutError:
             return False
     
     def add_captions_to_video(
@@ -948,54 +1809,96 @@ class VideoProcessor:
             text_color: Цвет текста
             bg_color: Цвет фона
         """
-        # Создаем файл субтитров
-        subtitles_file = Path(settings.TEMP_DIR) / f"subs_{uuid.uuid4().hex[:8]}.srt"
-        
-        with open(subtitles_file, "w", encoding="utf-8") as f:
-            for i, cap in enumerate(captions, 1):
-                start = self._format_srt_time(cap["start"])
-                end = self._format_srt_time(cap["end"])
-                text = cap["text"].replace("\n", " ")
-                f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+        video = self.get_video_info(input_video)["video"]
+        subtitles_file = self._write_ass_subtitles(
+            captions, video["width"], video["height"],
+            font_path, font_size, text_color, bg_color
+        )
         
         cmd = [
             self.ffmpeg_path,
             "-i", input_video,
-            "-vf", (
-                f"subtitles={subtitles_file}:"
-                f"force_style='Fontsize={font_size},"
-                f"PrimaryColour=&H{text_color},"
-                f"BackColour=&H{bg_color}'"
-            ),
+            "-vf", self._ass_filter(subtitles_file, font_path),
+            *self._video_codec_args(),
             "-c:a", "copy",
             "-y",
             output_video
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
-            
+            result = self._run_ffmpeg(cmd, timeout=300)
+            return result.returncode == 0
+        except ProcessingTimeoutError:
+            return False
+        finally:
             # Удаляем временный файл
             subtitles_file.unlink(missing_ok=True)
-            
-            return result.returncode == 0 and Path(output_video).exists()
-        except subprocess.TimeoutExpired:
-            return False
     
-    def _format_srt_time(self, seconds: float) -> str:
-        """Форматирование времени для формата SRT."""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+    def _write_ass_subtitles(
+        self,
+        captions: List[Dict[str, Any]],
+        width: int,
+        height: int,
+        font_path: Optional[str],
+        font_size: int,
+        text_color: str,
+        bg_color: str
+    ) -> Path:
+        """
+        Запись субтитров во временный ASS-файл.
+        
+        Стиль задаётся в заголовке, поэтому фильтр ass= не конвертирует SRT
+        и не применяет force_style при каждом запуске.
+        PlayRes = размер кадра, поэтому font_size задаётся в пикселях.
+        """
+        temp_dir = Path(settings.WORKER_TEMP_DIR)
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        subtitles_file = temp_dir / _temp_name("subs", ".ass")
+        
+        lines = [ASS_HEADER_TEMPLATE.format_map({
+            "w": width,
+            "h": height,
+            "font": Path(font_path).stem if font_path else "DejaVu Sans",
+            "size": font_size,
+            "primary": _ass_color(text_color),
+            "back": _ass_color(bg_color),
+        })]
+        fmt = self._format_ass_time
+        for cap in captions:
+            text = cap["text"].replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+            lines.append(
+                f"Dialogue: 0,{fmt(cap['start'])},{fmt(cap['end'])},Default,,0,0,0,,{text}\n"
+            )
+        
+        # Файл собирается в памяти и пишется одним вызовом
+        with open(subtitles_file, "w", encoding="utf-8") as f:
+            f.write("".join(lines))
+        
+        return subtitles_file
+    
+    def _ass_filter(self, subtitles_file: Path, font_path: Optional[str]) -> str:
+        """Фильтр наложения ASS-субтитров."""
+        vf = f"ass=filename={_escape_filter_path(subtitles_file)}"
+        if font_path:
+            vf += f":fontsdir={_escape_filter_path(Path(font_path).parent)}"
+        return vf
+    
+    def _format_ass_time(self, seconds: float) -> str:
+        """Форматирование времени для формата ASS (H:MM:SS.cc)."""
+        # Целые сотые: дробные остатки float давали 1.99 вместо 2.00
+        total_centis = round(seconds * 100)
+        hours, rem = divmod(total_centis, 360_000)
+        minutes, rem = divmod(rem, 6_000)
+        secs, centis = divmod(rem, 100)
+        return f"{hours:d}:{minutes:02d}:{secs:02d}.{centis:02d}"
     
     def apply_time_stretch(
         self,
         input_video: str,
         output_video: str,
         target_duration: float,
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        original_duration: Optional[float] = None
     ) -> bool:
         """
         Применение time-stretching к видео для достижения целевой длительности.
@@ -1007,76 +1910,253 @@ class VideoProcessor:
             output_video: Путь для сохранения результата
             target_duration: Желаемая длительность в секундах
             progress_callback: Callback для прогресса
+            original_duration: Длительность исходника, если уже известна
         """
-        # Получаем информацию о видео
-        info = self.get_video_info(input_video)
-        original_duration = info["duration"]
+        # Длительность берём из ffprobe, только если вызывающий её не передал
+        if original_duration is None:
+            original_duration = self.get_video_info(input_video)["duration"]
         
-        if original_duration <= 0:
+        if original_duration <= 0 or target_duration <= 0:
             return False
         
-        # Вычисляем коэффициент скорости
+        # Любой коэффициент раскладывается в цепочку atempo одного процесса,
+        # без промежуточных файлов на каждый множитель 2.0
         speed_factor = original_duration / target_duration
+        if abs(speed_factor - 1.0) <= STRETCH_TOLERANCE:
+            return self._copy_video(input_video, output_video)
         
-        # Ограничиваем для стабильности
-        # При больших изменениях лучше использовать несколько этапов
-        if speed_factor > 2.0:
-            # Разбиваем на несколько этапов
-            intermediate = Path(settings.TEMP_DIR) / f"stretch_{uuid.uuid4().hex[:8]}.mp4"
-            success = self._apply_single_stretch(input_video, str(intermediate), 2.0)
-            if not success:
+        cmd = [
+            self.ffmpeg_path,
+            "-i", input_video,
+            "-af", _atempo_chain(speed_factor),
+            "-c:v", "copy",  # Копируем видео без перекодирования
+            "-c:a", "aac",
+            "-b:a", "192k",
+            "-y",
+            output_video
+        ]
+        
+        try:
+            result = self._run_ffmpeg(cmd, timeout=300)
+            return result.returncode == 0
+        except ProcessingTimeoutError:
+            return False
+    
+    def apply_time_stretch_batch(
+        self,
+        jobs: List[Dict[str, Any]],
+        progress_callback: Optional[callable] = None
+    ) -> bool:
+        """
+        Time-stretching нескольких клипов (например, Shorts) одним процессом FFmpeg.
+        
+        Каждый клип - отдельный вход и отдельный выход процесса со своими
+        setpts (видео перекодируется) и цепочкой atempo; клипы, которые
+        растягивать не нужно, копируются. Вместо N запусков FFmpeg - один
+        на STRETCH_BATCH_SIZE клипов.
+        
+        Args:
+            jobs: Задания с полями input_video, output_video, target_duration
+            progress_callback: Callback для прогресса
+            
+        Returns:
+            True если все клипы обработаны
+        """
+        for batch_start in range(0, len(jobs), STRETCH_BATCH_SIZE):
+            batch = jobs[batch_start:batch_start + STRETCH_BATCH_SIZE]
+            
+            inputs = []
+            chains = []
+            outputs = []
+            output_positions = []
+            for i, job in enumerate(batch):
+                info = self.get_video_info(job["input_video"])
+                if info["duration"] <= 0 or job["target_duration"] <= 0:
+                    return False
+                
+                inputs.extend(["-i", job["input_video"]])
+                speed_factor = info["duration"] / job["target_duration"]
+                stretch = abs(speed_factor - 1.0) > STRETCH_TOLERANCE
+                if stretch:
+                    chains.append(f"[{i}:v]setpts=PTS/{speed_factor}[v{i}]")
+                    outputs.extend(["-map", f"[v{i}]", *self._video_codec_args()])
+                else:
+                    outputs.extend(["-map", f"{i}:v", "-c:v", "copy"])
+                if "audio" in info:
+                    if stretch:
+                        chains.append(f"[{i}:a]{_atempo_chain(speed_factor)}[a{i}]")
+                        outputs.extend(["-map", f"[a{i}]", "-c:a", "aac", "-b:a", "192k"])
+                    else:
+                        outputs.extend(["-map", f"{i}:a", "-c:a", "copy"])
+                outputs.extend(["-y", job["output_video"]])
+                output_positions.append(len(outputs) - 1)
+            
+            cmd = [self.ffmpeg_path, *inputs]
+            if chains:
+                cmd.extend(["-filter_complex", ";".join(chains)])
+            # -threads нужен каждому выходу, а не только последнему
+            output_indices = [len(cmd) + pos for pos in output_positions]
+            cmd.extend(outputs)
+            
+            # Видео перекодируется, поэтому лимит - на каждый клип пачки
+            try:
+                result = self._run_ffmpeg(
+                    cmd, timeout=300 * len(batch), output_indices=output_indices
+                )
+            except ProcessingTimeoutError:
                 return False
-            success = self.apply_time_stretch(str(intermediate), output_video, target_duration / 2.0)
-            intermediate.unlink(missing_ok=True)
-            return success
+            
+            if result.returncode != 0:
+                logger.error(f"FFmpeg batch stretch error: {result.stderr[-2000:]}")
+                return False
+            
+            if progress_callback:
+                done = batch_start + len(batch)
+                progress_callback(ProcessingProgress(
+                    current_step=done,
+                    total_steps=len(jobs),
+                    progress_percent=done / len(jobs) * 100,
+                    message=f"Stretched {done}/{len(jobs)} clips",
+                    stage="encoding"
+                ))
         
-        return self._apply_single_stretch(input_video, output_video, speed_factor)
+        return True
     
-    def _apply_single_stretch(
+    def render_final(
         self,
         input_video: str,
         output_video: str,
-        speed_factor: float
+        music_path: Optional[str] = None,
+        captions: Optional[List[Dict[str, Any]]] = None,
+        target_duration: Optional[float] = None,
+        volume: float = 0.3,
+        fade_in: float = 1.0,
+        fade_out: float = 2.0,
+        font_path: Optional[str] = None,
+        font_size: int = 48,
+        text_color: str = "white",
+        bg_color: str = "black@0.5",
+        progress_callback: Optional[callable] = None
     ) -> bool:
-        """Применение одного этапа time-stretching."""
-        # atempo фильтр работает в диапазоне 0.5 - 2.0
-        atempo_values = []
-        
-        if speed_factor >= 0.5 and speed_factor <= 2.0:
-            atempo_values.append(f"atempo={speed_factor}")
-        elif speed_factor < 0.5:
-            # Каскад atempo для замедления
-            current = speed_factor
-            while current < 0.5:
-                atempo_values.append("atempo=0.5")
-                current /= 0.5
+        """
+        Финальная сборка одним процессом FFmpeg: time-stretching, субтитры
+        и фоновая музыка.
+        
+        Заменяет последовательность apply_time_stretch -> add_captions_to_video ->
+        add_music_overlay: видео и аудио декодируются и кодируются один раз,
+        без промежуточных файлов. Время субтитров - в итоговой шкале
+        (после растягивания), музыка не растягивается.
+        
+        Args:
+            input_video: Путь к исходному видео
+            output_video: Путь для сохранения результата
+            music_path: Путь к фоновой музыке (None - без музыки)
+            captions: Субтитры с полями start, end, text (None - без субтитров)
+            target_duration: Желаемая длительность (None - без растягивания)
+            volume: Громкость музыки (0.0 - 1.0)
+            fade_in: Нарастание музыки в начале
+            fade_out: Затухание музыки в конце
+            font_path: Путь к шрифту субтитров
+            font_size: Размер шрифта
+            text_color: Цвет текста
+            bg_color: Цвет фона
+            progress_callback: Callback для прогресса
+        """
+        info = self.get_video_info(input_video)
+        duration = info["duration"]
+        if duration <= 0 or (target_duration is not None and target_duration <= 0):
+            return False
+        
+        final_duration = target_duration or duration
+        speed_factor = duration / final_duration
+        stretch = abs(speed_factor - 1.0) > STRETCH_TOLERANCE
+        
+        cmd = [self.ffmpeg_path, "-i", input_video]
+        if music_path:
+            cmd.extend(["-i", music_path])
+        
+        chains = []
+        
+        # Видео: растягивание и субтитры; без них поток копируется
+        video_filters = []
+        if stretch:
+            video_filters.append(f"setpts=PTS/{speed_factor}")
+        subtitles_file = None
+        if captions:
+            video = info["video"]
+            subtitles_file = self._write_ass_subtitles(
+                captions, video["width"], video["height"],
+                font_path, font_size, text_color, bg_color
+            )
+            video_filters.append(self._ass_filter(subtitles_file, font_path))
+        if video_filters:
+            chains.append(f"[0:v]{','.join(video_filters)}[v]")
+        
+        # Аудио: растянутая дорожка видео + музыка
+        audio_label = None
+        if "audio" in info:
+            audio_label = "0:a"
+            if stretch:
+                chains.append(f"[0:a]{_atempo_chain(speed_factor)}[voice]")
+                audio_label = "voice"
+        if music_path:
+            # Громкость и затухания - только на музыку, до смешивания с голосом
+            music = (
+                f"[1:a]atrim=end={final_duration},volume={volume},"
+                f"afade=t=in:st=0:d={fade_in},"
+                f"afade=t=out:st={max(0.0, final_duration - fade_out)}:d={fade_out}"
+            )
+            if audio_label:
+                chains.append(f"{music}[music]")
+                chains.append(
+                    f"[{audio_label}][music]amix=inputs=2:duration=first[a]"
+                )
+            else:
+                chains.append(f"{music}[a]")
+            audio_label = "a"
+        
+        if chains:
+            cmd.extend(["-filter_complex", ";".join(chains)])
+        cmd.extend(["-map", "[v]" if video_filters else "0:v"])
+        if audio_label:
+            cmd.extend(["-map", audio_label if audio_label == "0:a" else f"[{audio_label}]"])
+        
+        if video_filters:
+            cmd.extend(self._video_codec_args())
         else:
-            # Каскад atempo для ускорения
-            current = speed_factor
-            while current > 2.0:
-                atempo_values.append("atempo=2.0")
-                current /= 2.0
-            if current > 0.5:
-                atempo_values.append(f"atempo={current}")
+            cmd.extend(["-c:v", "copy"])
+        if audio_label == "0:a":
+            cmd.extend(["-c:a", "copy"])
+        elif audio_label:
+            cmd.extend(["-c:a", "aac", "-b:a", "192k"])
         
-        filter_complex = ",".join(atempo_values)
+        cmd.extend(["-movflags", "+faststart", "-y", output_video])
         
-        cmd = [
-            self.ffmpeg_path,
-            "-i", input_video,
-            "-filter_complex", filter_complex,
-            "-c:v", "copy",  # Копируем видео без перекодирования
-            "-c:a", "aac",
-            "-b:a", "192k",
-            "-y",
-            output_video
-        ]
+        def report(percent: float) -> None:
+            progress_callback(ProcessingProgress(
+                current_step=1,
+                total_steps=1,
+                progress_percent=percent,
+                message="Rendering final video",
+                stage="encoding"
+            ))
         
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
-            return result.returncode == 0 and Path(output_video).exists()
-        except subprocess.TimeoutExpired:
+            result = self._run_ffmpeg(
+                cmd,
+                timeout=600,
+                expected_duration=final_duration,
+                progress_callback=report if progress_callback else None
+            )
+            if result.returncode != 0:
+                logger.error(f"FFmpeg final render error: {result.stderr[-2000:]}")
+                return False
+            return True
+        except ProcessingTimeoutError:
             return False
+        finally:
+            if subtitles_file is not None:
+                subtitles_file.unlink(missing_ok=True)
 
 
 # Экземпляр процессора для использования в приложении
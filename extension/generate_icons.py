@@ -4,11 +4,12 @@
 Создаёт простые PNG иконки с буквой "A"
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 import os
 
-def create_icon(size, output_path):
-    """Создаёт иконку заданного размера"""
+def render_icon(size):
+    """Рисует иконку заданного размера"""
     # Создаём изображение с фоном
     img = Image.new('RGB', (size, size), color='#4F46E5')
     draw = ImageDraw.Draw(img)
@@ -32,6 +33,20 @@ def create_icon(size, output_path):
     y = (size - text_height) // 2
     
     draw.text((x, y), text, fill='white', font=font)
+    return img
+
+def create_icon(size, output_path, master=None):
+    """Создаёт иконку заданного размера
+    
+    Если передана master - большая готовая иконка, она уменьшается
+    вместо повторной загрузки шрифта и отрисовки буквы
+    """
+    if master is None:
+        img = render_icon(size)
+    elif master.size == (size, size):
+        img = master
+    else:
+        img = master.resize((size, size), Image.LANCZOS)
     
     # Сохраняем
     img.save(output_path, 'PNG')
@@ -44,9 +59,14 @@ def main():
     
     sizes = [16, 48, 128]
     
-    for size in sizes:
-        output_path = os.path.join(icons_dir, f'icon{size}.png')
-        create_icon(size, output_path)
+    # Букву рисуем один раз в наибольшем размере, остальные - уменьшением
+    master = render_icon(max(sizes))
+    
+    # Уменьшение и PNG-кодирование в Pillow отпускают GIL, поэтому хватает
+    # потоков: master не нужно передавать в другие процессы
+    output_paths = [os.path.join(icons_dir, f'icon{size}.png') for size in sizes]
+    with ThreadPoolExecutor(max_workers=len(sizes)) as executor:
+        list(executor.map(create_icon, sizes, output_paths, [master] * len(sizes)))
     
     print("\n✅ Все иконки созданы успешно!")
     print(f"📁 Расположение: {icons_dir}")
@@ -3,28 +3,42 @@ Tests for AutoDoc AI System.
 Базовые тесты для проверки структуры проекта.
 """
 
+import math
+
 import pytest
 
+from app.config import settings
+from app.models import GuideStatus, SessionStatus
+from app.schemas import (
+    ContentTypeEnum,
+    ErrorResponse,
+    GuideCreate,
+    HealthCheckResponse,
+    PaginatedResponse,
+)
+
+
+@pytest.fixture(scope="session")
+def main_app():
+    """FastAPI-приложение: импортируется один раз на сессию."""
+    from app.main import app
+
+    return app
+
 
 class TestConfig:
     """Тесты конфигурации."""
 
     def test_settings_loaded(self):
-        from app.config import settings
-
         assert settings.APP_NAME == "AutoDoc AI System"
         assert settings.APP_VERSION == "1.0.0"
 
     def test_database_url(self):
-        from app.config import settings
-
         url = settings.async_database_url
         assert "postgresql+asyncpg" in url
         assert settings.DATABASE_HOST in url
 
     def test_redis_url(self):
-        from app.config import settings
-
         url = settings.redis_url
         assert "redis://" in url
         assert str(settings.REDIS_PORT) in url
@@ -34,8 +48,6 @@ class TestModels:
     """Тесты моделей базы данных."""
 
     def test_guide_status_enum(self):
-        from app.models import GuideStatus
-
         assert GuideStatus.DRAFT.value == "draft"
         assert GuideStatus.READY.value == "ready"
         assert GuideStatus.GENERATING.value == "generating"
@@ -43,16 +55,12 @@ class TestModels:
         assert GuideStatus.FAILED.value == "failed"
 
     def test_session_status_enum(self):
-        from app.models import SessionStatus
-
         assert SessionStatus.UPLOADED.value == "uploaded"
         assert SessionStatus.PROCESSING.value == "processing"
         assert SessionStatus.COMPLETED.value == "completed"
         assert SessionStatus.FAILED.value == "failed"
 
     def test_content_type_enum(self):
-        from app.schemas import ContentTypeEnum
-
         assert ContentTypeEnum.VIDEO.value == "video"
         assert ContentTypeEnum.WIKI.value == "wiki"
         assert ContentTypeEnum.SHORTS.value == "shorts"
@@ -63,8 +71,6 @@ class TestSchemas:
     """Тесты Pydantic схем."""
 
     def test_guide_create_schema(self):
-        from app.schemas import GuideCreate
-
         guide = GuideCreate(
             title="Тестовый гайд",
             description="Описание",
@@ -75,8 +81,6 @@ class TestSchemas:
         assert guide.language == "ru"
 
     def test_pagination_response(self):
-        from app.schemas import PaginatedResponse
-
         response = PaginatedResponse(
             items=[],
             total=100,
@@ -124,6 +128,67 @@ class TestVideoProcessor:
         assert region.center_x == 250
         assert region.center_y == 250
 
+    def test_atempo_chain(self):
+        from app.services.video_processor import _atempo_chain
+
+        for factor in (5.0, 0.2, 1.25):
+            stages = [
+                float(stage.removeprefix("atempo="))
+                for stage in _atempo_chain(factor).split(",")
+            ]
+
+            assert all(0.5 <= stage <= 2.0 for stage in stages)
+            assert math.prod(stages) == pytest.approx(factor)
+
+    def test_keep_intervals(self):
+        from app.services.video_processor import VideoProcessor
+
+        def keep(silences, duration):
+            return [
+                (round(start, 6), round(end, 6))
+                for start, end in VideoProcessor._keep_intervals(silences, duration)
+            ]
+
+        # Отступ 0.1 с у каждой границы тишины
+        assert keep([(2.0, 4.0), (4.15, 6.0)], 10.0) == [(0.0, 2.1), (3.9, 4.25), (5.9, 10.0)]
+        # Пауза короче двух отступов не вырезается
+        assert keep([(2.0, 2.15)], 5.0) == [(0.0, 5.0)]
+        # Тишина в начале и запись без тишины
+        assert keep([(0.0, 1.0)], 5.0) == [(0.9, 5.0)]
+        assert keep([], 5.0) == [(0.0, 5.0)]
+
+    def test_format_ass_time(self):
+        from app.services.video_processor import video_processor
+
+        fmt = video_processor._format_ass_time
+        # 0.29 * 100 = 28.999... - округление, а не отбрасывание
+        assert fmt(0.29) == "0:00:00.29"
+        assert fmt(1.999) == "0:00:02.00"
+        # Перенос сотых в минуты и часы
+        assert fmt(59.996) == "0:01:00.00"
+        assert fmt(3599.999) == "1:00:00.00"
+        assert fmt(3723.5) == "1:02:03.50"
+
+    def test_write_ass_subtitles(self, tmp_path, monkeypatch):
+        from app.services.video_processor import video_processor
+
+        monkeypatch.setattr(settings, "WORKER_TEMP_DIR", tmp_path)
+
+        path = video_processor._write_ass_subtitles(
+            [{"start": 0, "end": 1.5, "text": "Нажмите {OK}\nи ждите"}],
+            1920, 1080, None, 48, "white", "black@0.5",
+        )
+        content = path.read_text(encoding="utf-8")
+
+        assert path.parent == tmp_path
+        assert content.startswith("[Script Info]\n")
+        assert "PlayResX: 1920\nPlayResY: 1080\n" in content
+        assert "Style: Default,DejaVu Sans,48,&H00FFFFFF,&H00FFFFFF,&H80000000," in content
+        assert content.endswith(
+            "Dialogue: 0,0:00:00.00,0:00:01.50,Default,,0,0,0,,"
+            "Нажмите \\{OK\\}\\Nи ждите\n"
+        )
+
 
 class TestSileroTTS:
     """Тесты Silero TTS (текущий движок озвучки по умолчанию)."""
@@ -200,12 +265,70 @@ class TestStorageService:
         assert StorageType.WIKI.value == "wiki"
 
 
+class TestIpc:
+    """Тесты формата обмена задачами с ai_runner."""
+
+    @staticmethod
+    def _result():
+        from datetime import datetime
+
+        return {
+            "task_id": "tts_1_abc",
+            "success": True,
+            "result": {"segments": [{"start": 0.0, "end": 1.5, "text": "Привет"}]},
+            "completed_at": datetime(2026, 10, 16, 12, 30, 5),
+        }
+
+    def _expected(self):
+        expected = self._result()
+        expected["completed_at"] = "2026-10-16T12:30:05"
+        return expected
+
+    def test_json_round_trip(self):
+        from app import ipc
+
+        data = ipc.encode(self._result(), ipc.FORMAT_JSON)
+
+        assert ipc.detect_format(data) == ipc.FORMAT_JSON
+        assert ipc.decode(data) == self._expected()
+
+    def test_msgpack_round_trip(self):
+        pytest.importorskip("msgpack")
+        from app import ipc
+
+        data = ipc.encode(self._result(), ipc.FORMAT_MSGPACK)
+
+        assert ipc.default_format() == ipc.FORMAT_MSGPACK
+        assert ipc.detect_format(data) == ipc.FORMAT_MSGPACK
+        assert ipc.decode(data) == self._expected()
+
+    @pytest.mark.parametrize("fmt", ["json", "msgpack"])
+    def test_batch_round_trip(self, fmt):
+        if fmt == "msgpack":
+            pytest.importorskip("msgpack")
+        from app import ipc
+
+        batch = [self._result(), {"task_id": "tts_2_def", "success": False, "error": "boom"}]
+        data = ipc.encode(batch, fmt)
+
+        assert ipc.detect_format(data) == fmt
+        assert ipc.decode(data) == [self._expected(), batch[1]]
+
+    def test_detect_format_without_msgpack(self, monkeypatch):
+        from app import ipc
+
+        monkeypatch.setattr(ipc, "msgpack", None)
+
+        assert ipc.default_format() == ipc.FORMAT_JSON
+        assert ipc.detect_format(b"\x82\xa7task_id") == ipc.FORMAT_JSON
+        with pytest.raises(RuntimeError):
+            ipc.encode({"task_id": "x"}, ipc.FORMAT_MSGPACK)
+
+
 class TestAPIEndpoints:
     """Тесты API схем."""
 
     def test_health_check_response(self):
-        from app.schemas import HealthCheckResponse
-
         response = HealthCheckResponse(
             status="healthy",
             version="1.0.0",
@@ -221,8 +344,6 @@ class TestAPIEndpoints:
         assert response.gpu_available is True
 
     def test_error_response(self):
-        from app.schemas import ErrorResponse
-
         error = ErrorResponse(
             error="Test error",
             details=[{"code": "test", "message": "Test message"}],
@@ -235,22 +356,16 @@ class TestAPIEndpoints:
 class TestMainApp:
     """Тесты главного приложения."""
 
-    def test_app_title(self):
-        from app.main import app
-
-        assert "AutoDoc AI System" in app.title
-
-    def test_app_version(self):
-        from app.main import app
-
-        assert app.version == "1.0.0"
+    def test_app_title(self, main_app):
+        assert "AutoDoc AI System" in main_app.title
 
-    def test_api_router_included(self):
-        from app.main import app
+    def test_app_version(self, main_app):
+        assert main_app.version == "1.0.0"
 
+    def test_api_router_included(self, main_app):
         # api_router монтируется как под-приложение, поэтому пути не лежат
         # плоско в app.routes — проверяем по канонической OpenAPI-схеме.
-        paths = app.openapi()["paths"]
+        paths = main_app.openapi()["paths"]
         assert any(p.startswith("/api/v1") for p in paths)
 
 
@@ -14,9 +14,12 @@ AI Runner - Изолированный subprocess для выполнения AI
 - wiki_generation: Генерация Wiki-статей
 
 Usage:
-    python workers/ai_runner.py --input <input.json> --output <output.json>
+    python workers/ai_runner.py --input <input.json> --output <output.json> [--preload]
+    python workers/ai_runner.py --stdio [--preload]   # вход в stdin, результат в stdout
+    (--format msgpack - результат в msgpack; вход в файле/очереди определяется сам)
+    python workers/ai_runner.py --serve <queue>   # долгоживущий воркер пула
 
-Input format:
+Input format (или JSON-массив таких объектов - тогда и выход массив):
     {
         "task_type": "video_processing",
         "task_id": "abc123",
@@ -33,31 +36,129 @@ Output format:
     }
 """
 
-import argparse
-import json
+import atexit
+import ctypes
+import ctypes.util
+import gc
+import importlib
 import logging
 import os
+import queue
+import shutil
 import sys
+import threading
+import time
 import traceback
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
 
 # Добавляем корень проекта в пути для импортов
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+from app import ipc
+from app.config import settings
+from app.services.storage import StorageBucket, storage_service
+
 logger = logging.getLogger("AI-Runner")
 
 
+def prefetch(path: Path) -> None:
+    """
+    Попросить ядро заранее подтянуть файл в page cache.
+    
+    Только WILLNEED: POSIX_FADV_SEQUENTIAL действует на конкретный
+    дескриптор, а ffmpeg откроет файл своим.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"posix_fadvise failed for {path}: {e}")
+
+
+# Очередь путей на удаление и поток, который её разбирает
+_cleanup_queue: "queue.Queue[Path]" = queue.Queue()
+_cleanup_thread: Optional[threading.Thread] = None
+
+
+def _remove_path(path: Path) -> None:
+    """Удалить файл или каталог; отсутствующий путь - не ошибка."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except (IsADirectoryError, PermissionError):
+        # unlink() на каталоге: EISDIR в Linux, EPERM в macOS
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            raise
+
+
+def _cleanup_worker() -> None:
+    """Фоновое удаление временных файлов из _cleanup_queue."""
+    while True:
+        path = _cleanup_queue.get()
+        try:
+            _remove_path(path)
+        except Exception as e:
+            logger.warning(f"Failed to cleanup {path}: {e}")
+        finally:
+            _cleanup_queue.task_done()
+
+
+def _start_cleanup_thread() -> None:
+    """Запустить поток очистки при первом обращении."""
+    global _cleanup_thread
+    if _cleanup_thread is None:
+        _cleanup_thread = threading.Thread(target=_cleanup_worker, name="cleanup", daemon=True)
+        _cleanup_thread.start()
+
+
+# Перед выходом процесса дочищаем очередь: daemon-поток иначе просто убьют
+atexit.register(_cleanup_queue.join)
+
+
+def _load_libc():
+    """glibc для malloc_trim (на musl/macOS функции нет - тогда None)."""
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "malloc_trim") else None
+
+
+_LIBC = _load_libc()
+
+# Промежуточные обновления статуса (тот же статус, без ошибки) не чаще раза в столько секунд
+STATUS_UPDATE_INTERVAL = 1.0
+
+# Синхронный движок БД, общий для всех задач процесса
+_ENGINE = None
+
+
+def _get_engine():
+    """Ленивое создание движка SQLAlchemy (один пул соединений на процесс)."""
+    global _ENGINE
+    
+    if _ENGINE is None:
+        from sqlalchemy import create_engine
+        
+        _ENGINE = create_engine(settings.sync_database_url, pool_pre_ping=True, pool_size=2)
+    return _ENGINE
+
+
 # === Task Handlers ===
 
 class TaskHandler:
@@ -69,6 +170,8 @@ class TaskHandler:
         self.payload = payload
         self.guide_id = payload.get("guide_id")
         self.task_id = payload.get("task_id", "unknown")
+        self._last_status = None
+        self._last_status_update = 0.0
         
     def execute(self) -> Dict[str, Any]:
         """Выполнение задачи. Переопределить в наследниках."""
@@ -86,74 +189,72 @@ class TaskHandler:
             error: Текст ошибки (для FAILED)
             traceback: Полный traceback (для FAILED)
         """
+        if not self.guide_id:
+            return
+        
+        # Частые обновления прогресса (progress_callback) схлопываем
+        now = time.monotonic()
+        if (
+            status == self._last_status
+            and not error
+            and now - self._last_status_update < STATUS_UPDATE_INTERVAL
+        ):
+            return
+        self._last_status = status
+        self._last_status_update = now
+        
         try:
-            from sqlalchemy import create_engine
-            from sqlalchemy.ext.asyncio import create_async_engine
-            from app.config import settings
+            from sqlalchemy import update
+            from sqlalchemy.orm import Session
             from app.models import Guide
-            from sqlalchemy.future import select
-            import asyncio
             
-            if not self.guide_id:
-                return
+            # В модели Guide нет колонок статуса обработки/прогресса/debug_info,
+            # поэтому пишем только то, что есть в схеме, одним UPDATE
+            values = {"updated_at": datetime.utcnow()}
+            if error:
+                values["error_message"] = error[:1000]  # Ограничиваем длину
             
-            # Используем синхронный движок для subprocess
-            engine = create_engine(settings.sync_database_url)
+            with Session(_get_engine()) as session:
+                session.execute(
+                    update(Guide).where(Guide.id == self.guide_id).values(**values)
+                )
+                session.commit()
             
-            def update_status():
-                from sqlalchemy.orm import Session
-                with Session(engine) as session:
-                    guide = session.query(Guide).filter(Guide.id == self.guide_id).first()
-                    if guide:
-                        guide.processing_status = status
-                        guide.processing_progress = progress
-                        if error:
-                            guide.error_message = error[:1000]  # Ограничиваем длину
-                        if traceback:
-                            guide.debug_info = traceback[:2000]
-                        session.commit()
-                        logger.info(f"Task {self.task_id} status updated to: {status}")
-            
-            # Запускаем в executor для синхронного SQLAlchemy
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_in_executor(None, update_status)
-            finally:
-                loop.close()
+            logger.info(f"Task {self.task_id} status updated to: {status} ({progress}%)")
+            if traceback:
+                logger.debug(traceback)
                 
         except Exception as e:
             logger.warning(f"Failed to update task status: {e}")
     
-    def download_from_s3(self, s3_key: str, local_path: Path) -> bool:
+    def resolve_input(self, s3_key: str) -> Path:
         """
-        Скачивание файла из S3.
+        Путь к входному файлу в хранилище.
+        
+        Хранилище локальное: файл читается ffmpeg прямо оттуда, без
+        промежуточной копии в WORKER_TEMP_DIR. Такой путь нельзя
+        передавать в cleanup().
         
         Args:
-            s3_key: Ключ объекта в S3
-            local_path: Локальный путь для сохранения
+            s3_key: Ключ объекта (relative_path из хранилища)
             
         Returns:
-            True если успешно
+            Путь к файлу
         """
         try:
-            from app.services.storage import storage_service
-            
-            # Скачиваем в chunks для больших файлов
-            storage_service.download_file(
-                s3_key=s3_key,
-                local_path=str(local_path),
-            )
-            return True
-            
+            path = storage_service.resolve_path(s3_key)
         except Exception as e:
-            logger.error(f"Failed to download {s3_key}: {e}")
-            return False
+            raise RuntimeError(f"Failed to resolve {s3_key}: {e}") from e
+        
+        prefetch(path)
+        return path
     
     def upload_to_s3(self, local_path: Path, bucket: str, guide_id: int, subfolder: str = "") -> str:
         """
         Загрузка файла в S3.
         
+        Файл переносится в хранилище (move), после вызова его на месте нет.
+        
         Args:
             local_path: Локальный путь к файлу
             bucket: Бакет назначения
@@ -163,9 +264,6 @@ class TaskHandler:
         Returns:
             S3 ключ загруженного файла
         """
-        from app.services.storage import storage_service, StorageBucket
-        from app.config import settings
-        
         # Конвертируем строковый bucket в enum если нужно
         try:
             bucket_enum = StorageBucket(bucket)
@@ -177,21 +275,16 @@ class TaskHandler:
             bucket=bucket_enum or StorageBucket.VIDEOS,
             guide_id=guide_id,
             subfolder=subfolder,
+            move=True,
         )
         return result.get("object_key", "")
     
     def cleanup(self, *paths: Path) -> None:
-        """Очистка временных файлов."""
+        """Очистка временных файлов (в фоновом потоке, результат не ждёт)."""
         for path in paths:
-            try:
-                if path and path.exists():
-                    if path.is_file():
-                        path.unlink()
-                    elif path.is_dir():
-                        import shutil
-                        shutil.rmtree(path)
-            except Exception as e:
-                logger.warning(f"Failed to cleanup {path}: {e}")
+            if path:
+                _cleanup_queue.put(path)
+        _start_cleanup_thread()
 
 
 class VideoProcessingHandler(TaskHandler):
@@ -202,7 +295,6 @@ class VideoProcessingHandler(TaskHandler):
     def execute(self) -> Dict[str, Any]:
         """Обработка видео с применением зума."""
         from app.services.video_processor import video_processor
-        from app.config import settings
         
         video_key = self.payload["video_key"]
         steps = self.payload.get("steps", [])
@@ -211,11 +303,8 @@ class VideoProcessingHandler(TaskHandler):
         
         logger.info(f"Processing video {video_key} for guide {self.guide_id}")
         
-        # Скачиваем видео
-        video_path = settings.WORKER_TEMP_DIR / f"video_{self.guide_id}.mp4"
-        
-        if not self.download_from_s3(video_key, video_path):
-            raise RuntimeError(f"Failed to download video: {video_key}")
+        # Видео читается прямо из хранилища
+        video_path = self.resolve_input(video_key)
         
         # Создаем сегменты
         segments = []
@@ -254,7 +343,7 @@ class VideoProcessingHandler(TaskHandler):
         output_key = self.upload_to_s3(output_path, output_bucket, self.guide_id, "processed")
         
         # Очищаем
-        self.cleanup(video_path, output_path)
+        self.cleanup(output_path)
         
         return {
             "success": True,
@@ -272,7 +361,6 @@ class ShortsGenerationHandler(TaskHandler):
     def execute(self) -> Dict[str, Any]:
         """Генерация Shorts."""
         from app.services.video_processor import video_processor
-        from app.config import settings
         
         video_key = self.payload["video_key"]
         target_platform = self.payload.get("target_platform", "tiktok")
@@ -281,11 +369,8 @@ class ShortsGenerationHandler(TaskHandler):
         
         logger.info(f"Generating shorts for guide {self.guide_id}")
         
-        # Скачиваем видео
-        video_path = settings.WORKER_TEMP_DIR / f"shorts_src_{self.guide_id}.mp4"
-        
-        if not self.download_from_s3(video_key, video_path):
-            raise RuntimeError(f"Failed to download video: {video_key}")
+        # Видео читается прямо из хранилища
+        video_path = self.resolve_input(video_key)
         
         # Формируем выходной путь
         output_path = settings.WORKER_TEMP_DIR / f"shorts_{self.guide_id}.mp4"
@@ -313,7 +398,7 @@ class ShortsGenerationHandler(TaskHandler):
         output_key = self.upload_to_s3(output_path, output_bucket, self.guide_id, "shorts")
         
         # Очищаем
-        self.cleanup(video_path, output_path)
+        self.cleanup(output_path)
         
         return {
             "success": True,
@@ -349,7 +434,6 @@ class AIProcessingHandler(TaskHandler):
     def execute(self) -> Dict[str, Any]:
         """Полная AI-обработка: транскрипция, анализ, генерация метаданных."""
         from app.services.ai_service import ai_service
-        from app.config import settings
         
         audio_key = self.payload["audio_key"]
         click_events = self.payload.get("click_events", [])
@@ -357,11 +441,8 @@ class AIProcessingHandler(TaskHandler):
         
         logger.info(f"Full AI processing for guide {self.guide_id}")
         
-        # Скачиваем аудио
-        audio_path = settings.WORKER_TEMP_DIR / f"ai_audio_{self.guide_id}.wav"
-        
-        if not self.download_from_s3(audio_key, audio_path):
-            raise RuntimeError(f"Failed to download audio: {audio_key}")
+        # Аудио читается прямо из хранилища
+        audio_path = self.resolve_input(audio_key)
         
         # Выполняем обработку
         results = ai_service.process_recording(
@@ -371,9 +452,6 @@ class AIProcessingHandler(TaskHandler):
             language=language,
         )
         
-        # Очищаем
-        self.cleanup(audio_path)
-        
         return {
             "success": True,
             "guide_id": self.guide_id,
@@ -389,7 +467,6 @@ class TTSGenerationHandler(TaskHandler):
     def execute(self) -> Dict[str, Any]:
         """Генерация озвучки текста."""
         from app.services.tts_service import tts_service
-        from app.config import settings
         
         step_id = self.payload["step_id"]
         text = self.payload["text"]
@@ -520,6 +597,29 @@ HANDLERS = {
 }
 
 
+def _post_task_cleanup() -> None:
+    """
+    Освобождение памяти между задачами (важно для долгоживущего --serve).
+    
+    Кэш CUDA-аллокатора чистится только если torch уже загружен задачей -
+    ради очистки его не импортируем. malloc_trim возвращает ОС свободные
+    страницы кучи glibc после больших рендеров.
+    """
+    gc.collect()
+    
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        try:
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+                torch.cuda.ipc_collect()
+        except Exception as e:
+            logger.debug(f"CUDA cleanup failed: {e}")
+    
+    if _LIBC is not None:
+        _LIBC.malloc_trim(0)
+
+
 def execute_task(task_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Выполнение задачи через соответствующий handler.
@@ -537,30 +637,274 @@ def execute_task(task_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         raise ValueError(f"Unknown task type: {task_type}")
     
     handler = handler_class(payload)
-    return handler.execute()
+    try:
+        return handler.execute()
+    finally:
+        _post_task_cleanup()
 
 
 # === Main Entry Point ===
 
+# Сообщение в очереди, по которому воркер пула завершает работу
+STOP_SENTINEL = "__stop__"
+# Сколько секунд результат ждёт в Redis, пока его заберёт celery-воркер
+RESULT_TTL = 3600
+# Пауза перед повтором BLPOP после обрыва связи с Redis: удваивается
+# с каждой неудачей до SERVE_RECONNECT_MAX_DELAY
+SERVE_RECONNECT_DELAY = 1.0
+SERVE_RECONNECT_MAX_DELAY = 30.0
+
+
+def run_once(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Выполнение одной задачи по входным данным.
+    
+    Args:
+        input_data: Словарь во входном формате (task_type, task_id, payload)
+        
+    Returns:
+        Результат в выходном формате (ошибки не пробрасываются)
+    """
+    task_id = input_data.get("task_id", "unknown")
+    task_type = input_data.get("task_type", "unknown")
+    payload = input_data.get("payload", {})
+    
+    logger.info(f"Executing task {task_type}/{task_id}")
+    
+    result = {
+        "task_id": task_id,
+        "success": False,
+        "result": None,
+        "error": None,
+        "completed_at": datetime.utcnow(),
+    }
+    
+    try:
+        result["result"] = execute_task(task_type, payload)
+        result["success"] = True
+        logger.info(f"Task {task_type}/{task_id} completed successfully")
+        
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+        logger.error(f"Task {task_type}/{task_id} failed: {e}")
+    
+    return result
+
+
+# Модули, которые handlers импортируют при выполнении
+HANDLER_MODULES = (
+    "app.services.video_processor",
+    "app.services.ai_service",
+    "app.services.aligner",
+    "app.services.storage",
+)
+
+
+def preload_handlers() -> None:
+    """Заранее импортировать модули handlers, чтобы первая задача не ждала импорта."""
+    for module_name in HANDLER_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"Failed to preload {module_name}: {e}")
+
+
+def serve(queue_name: str) -> None:
+    """
+    Долгоживущий воркер пула: забирает задачи из Redis-списка.
+    
+    Интерпретатор и тяжёлые модули поднимаются один раз, дальше
+    каждая задача - это BLPOP -> run_once -> LPUSH результата в result_key.
+    Завершается по сообщению STOP_SENTINEL; при обрыве связи с Redis
+    ждёт и повторяет BLPOP.
+    
+    Args:
+        queue_name: Имя Redis-списка с задачами
+    """
+    import redis
+    
+    client = redis.from_url(settings.redis_url)
+    preload_handlers()
+    logger.info(f"AI Runner serving queue {queue_name}")
+    
+    delay = SERVE_RECONNECT_DELAY
+    while True:
+        try:
+            _, raw = client.blpop(queue_name)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            logger.warning(f"Redis unavailable: {e}, retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, SERVE_RECONNECT_MAX_DELAY)
+            continue
+        delay = SERVE_RECONNECT_DELAY
+        
+        if raw == STOP_SENTINEL.encode():
+            logger.info("Stop sentinel received, shutting down")
+            break
+        
+        try:
+            _handle_queue_message(client, raw)
+        except Exception as e:
+            # Одно плохое сообщение не должно останавливать воркер пула
+            logger.exception(f"Failed to handle queue message: {e}")
+
+
+def _handle_queue_message(client, raw: bytes) -> None:
+    """
+    Выполнить задачу из очереди и положить результат в её result_key.
+    
+    Ответ - в том же формате, в котором пришла задача. Если сообщение
+    не разбирается или это не объект задачи, но result_key известен,
+    туда кладётся результат с ошибкой, чтобы вызывающий не ждал таймаута.
+    """
+    fmt = ipc.detect_format(raw)
+    try:
+        input_data = ipc.decode(raw, fmt)
+    except Exception as e:
+        # result_key внутри сообщения - без разбора его не достать
+        logger.error(f"Invalid queue message: {e}")
+        return
+    
+    if not isinstance(input_data, dict):
+        logger.error(f"Queue message is not a task object: {type(input_data).__name__}")
+        return
+    
+    result_key = input_data.get("result_key")
+    if not isinstance(result_key, (str, bytes)) or not result_key:
+        logger.error(f"Queue message without result_key: task {input_data.get('task_id')}")
+        return
+    
+    result = run_once(input_data)
+    try:
+        encoded = ipc.encode(result, fmt)
+    except Exception as e:
+        logger.error(f"Failed to encode result for {result_key}: {e}")
+        encoded = ipc.encode({
+            "task_id": result.get("task_id", "unknown"),
+            "success": False,
+            "result": None,
+            "error": f"Result is not serializable: {e}",
+        }, fmt)
+    
+    client.lpush(result_key, encoded)
+    client.expire(result_key, RESULT_TTL)
+
+
+def run_stdio(preload: bool = False, fmt: str = ipc.FORMAT_JSON) -> None:
+    """
+    Режим --stdio: задача (или список задач) из stdin, результат в stdout.
+    
+    Настоящий stdout оставляется только под результат: fd 1 перенаправляется
+    в stderr, чтобы логи и вывод дочерних процессов не испортили JSON.
+    """
+    sys.stdout.flush()
+    result_fd = os.dup(1)
+    os.dup2(2, 1)
+    
+    if preload:
+        preload_handlers()
+    
+    try:
+        input_data = ipc.decode(sys.stdin.buffer.read(), fmt)
+    except ValueError as e:
+        output = {
+            "success": False,
+            "error": f"Invalid {fmt} on stdin: {e}",
+            "task_id": "unknown",
+        }
+    else:
+        if isinstance(input_data, list):
+            output = [run_once(item) for item in input_data]
+        else:
+            output = run_once(input_data)
+    
+    with os.fdopen(result_fd, "wb") as f:
+        f.write(ipc.encode(output, fmt))
+    
+    results = output if isinstance(output, list) else [output]
+    sys.exit(0 if all(r["success"] for r in results) else 1)
+
+
+def write_result(path: Path, result: Any, fmt: str = ipc.FORMAT_JSON) -> None:
+    """
+    Атомарная запись результата: .tmp рядом и os.replace.
+    
+    Родитель никогда не увидит наполовину записанный файл.
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(ipc.encode(result, fmt))
+    os.replace(tmp_path, path)
+
+
+USAGE = (
+    "usage: ai_runner.py --input FILE --output FILE [--preload] [--format json|msgpack]\n"
+    "       ai_runner.py --stdio [--preload] [--format json|msgpack]\n"
+    "       ai_runner.py --serve QUEUE"
+)
+# Флаги без значения и флаги со значением
+BOOL_FLAGS = ("--stdio", "--preload")
+VALUE_FLAGS = ("--input", "--output", "--serve", "--format")
+
+
+def parse_args(argv: List[str]) -> SimpleNamespace:
+    """
+    Разбор аргументов без argparse.
+    
+    Флагов шесть, а импорт argparse заметен в старте subprocess,
+    который запускается на каждую задачу.
+    """
+    args = {flag[2:]: False for flag in BOOL_FLAGS}
+    args.update({flag[2:]: None for flag in VALUE_FLAGS})
+    
+    it = iter(argv)
+    for arg in it:
+        if arg in BOOL_FLAGS:
+            args[arg[2:]] = True
+        elif arg in VALUE_FLAGS:
+            value = next(it, None)
+            if value is None:
+                sys.exit(f"{USAGE}\nerror: {arg} requires a value")
+            args[arg[2:]] = value
+        else:
+            sys.exit(f"{USAGE}\nerror: unrecognized argument: {arg}")
+    
+    for key in ("input", "output"):
+        if args[key] is not None:
+            args[key] = Path(args[key])
+    
+    args["format"] = args["format"] or ipc.FORMAT_JSON
+    if args["format"] not in ipc.FORMATS:
+        sys.exit(f"{USAGE}\nerror: --format must be one of: {', '.join(ipc.FORMATS)}")
+    return SimpleNamespace(**args)
+
+
 def main():
     """Точка входа для AI Runner."""
-    parser = argparse.ArgumentParser(
-        description="AI Runner - Изолированный subprocess для AI задач"
-    )
-    parser.add_argument(
-        "--input",
-        type=Path,
-        required=True,
-        help="Путь к входному JSON файлу"
-    )
-    parser.add_argument(
-        "--output",
-        type=Path,
-        required=True,
-        help="Путь к выходному JSON файлу"
+    args = parse_args(sys.argv[1:])
+    
+    # Логирование настраивается только при запуске скриптом, не при импорте
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+        ],
     )
     
-    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+        return
+    
+    if args.stdio:
+        run_stdio(preload=args.preload, fmt=args.format)
+        return
+    
+    if not args.input or not args.output:
+        sys.exit(f"{USAGE}\nerror: --input and --output are required without --serve or --stdio")
+    
+    if args.preload:
+        preload_handlers()
     
     logger.info(f"AI Runner started. Input: {args.input}, Output: {args.output}")
     
@@ -571,56 +915,33 @@ def main():
             "error": f"Input file not found: {args.input}",
             "task_id": "unknown",
         }
-        with open(args.output, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        write_result(args.output, result, args.format)
         sys.exit(1)
     
     # Читаем входные данные
     try:
-        with open(args.input, "r", encoding="utf-8") as f:
-            input_data = json.load(f)
-    except json.JSONDecodeError as e:
+        with open(args.input, "rb") as f:
+            input_data = ipc.decode(f.read())
+    except ValueError as e:
         result = {
             "success": False,
-            "error": f"Invalid JSON in input file: {e}",
+            "error": f"Invalid input file: {e}",
             "task_id": "unknown",
         }
-        with open(args.output, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        write_result(args.output, result, args.format)
         sys.exit(1)
     
-    task_id = input_data.get("task_id", "unknown")
-    task_type = input_data.get("task_type", "unknown")
-    payload = input_data.get("payload", {})
-    
-    logger.info(f"Executing task {task_type}/{task_id}")
-    
-    # Выполняем задачу
-    result = {
-        "task_id": task_id,
-        "success": False,
-        "result": None,
-        "error": None,
-        "completed_at": datetime.utcnow().isoformat(),
-    }
+    # Список задач - пачка мелких задач в одном процессе
+    if isinstance(input_data, list):
+        results = [run_once(item) for item in input_data]
+        write_result(args.output, results, args.format)
+        logger.info(f"Batch of {len(results)} results written to {args.output}")
+        sys.exit(0 if all(r["success"] for r in results) else 1)
     
-    try:
-        result["result"] = execute_task(task_type, payload)
-        result["success"] = True
-        logger.info(f"Task {task_type}/{task_id} completed successfully")
-        
-    except Exception as e:
-        result["error"] = str(e)
-        result["traceback"] = traceback.format_exc()
-        logger.error(f"Task {task_type}/{task_id} failed: {e}")
-        # Записываем результат с ошибкой
-        with open(args.output, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        sys.exit(1)
+    result = run_once(input_data)
     
     # Записываем результат
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    write_result(args.output, result, args.format)
     
     logger.info(f"Result written to {args.output}")
     